@@ -0,0 +1,84 @@
+"""
+In-process cache of the course catalogue.
+The catalogue changes rarely but is read on almost every page, so each worker keeps
+all courses in memory as ready-to-serialize ShowCourse dicts, ordered by id, with an
+id -> course map: listing a page, showing a course and mapping search hits to courses
+are memory lookups instead of queries.
+Writes in this process call invalidate() after committing. Writes by other workers
+(and by the CSV import CLI) are picked up through the "courses" row of table_versions,
+which is compared with the cached version at most every COURSE_CACHE_CHECK_SECONDS.
+"""
+import bisect
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+import fast_json
+import models
+import schemas
+from repository import table_version
+
+# How long a worker may serve the catalogue without checking whether another process changed it
+COURSE_CACHE_CHECK_SECONDS = float(os.getenv("COURSE_CACHE_CHECK_SECONDS", "2"))
+
+
+@dataclass(frozen=True)
+class Catalogue:
+    """Immutable snapshot of the courses table; replaced as a whole on reload."""
+    version: int
+    courses: List[dict]  # Ordered by id
+    ids: List[int]  # courses' ids, for binary search
+    by_id: Dict[int, dict]
+
+    def page(self, after_id: Optional[int], limit: int) -> List[dict]:
+        start = 0 if after_id is None else bisect.bisect_right(self.ids, after_id)
+        return self.courses[start:start + limit]
+
+
+class CourseCache:
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._catalogue: Optional[Catalogue] = None
+        self._checked_at = 0.0
+
+    def get(self, db: Session) -> Catalogue:
+        """Current catalogue, loaded (or reloaded after a change by any process) with `db`."""
+        with self._lock:
+            catalogue = self._catalogue
+            if catalogue is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return catalogue
+            version = table_version.get(table_version.COURSES, db)
+            if catalogue is None or catalogue.version != version:
+                catalogue = self._load(version, db)
+                self._catalogue = catalogue
+            self._checked_at = time.monotonic()
+            return catalogue
+
+    def _load(self, version: int, db: Session) -> Catalogue:
+        # Same transaction as the version read, so the rows match `version`
+        courses = fast_json.rows_as_dicts(
+            db.query(*fast_json.schema_columns(models.Course, schemas.ShowCourse))
+            .filter(models.Course.id.isnot(None))
+            .order_by(models.Course.id)
+            .all()
+        )
+        print(f"📚 Loaded course catalogue: {len(courses)} courses (version {version})")
+        return Catalogue(
+            version=version,
+            courses=courses,
+            ids=[course["id"] for course in courses],
+            by_id={course["id"]: course for course in courses}
+        )
+
+    def invalidate(self):
+        """Drop the catalogue (called after committing a change to the courses table)."""
+        with self._lock:
+            self._catalogue = None
+
+
+course_cache = CourseCache(COURSE_CACHE_CHECK_SECONDS)
@@ -0,0 +1,179 @@
+"""
+Streaming, idempotent bulk import of courses from CSV (columns: course_code, title,
+instructors and optionally Credits; other columns such as id are ignored).
+Rows are read with the csv module in batches; each batch is one transaction that
+updates courses whose course_code already exists and inserts the others, so the
+import can be re-run on the same file without creating duplicates.
+Used by the CLI (python db.py [results.csv]) and by POST /course/bulk.
+"""
+import csv
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from course_cache import course_cache
+from repository import table_version
+
+IMPORT_BATCH_SIZE = int(os.getenv("COURSE_IMPORT_BATCH_SIZE", "500"))
+REQUIRED_COLUMNS = ("course_code", "title", "instructors")
+
+# Only touches rows whose values differ, so re-importing an unchanged file writes nothing
+UPDATE_COURSE = text("""
+    UPDATE courses SET title = :title, instructors = :instructors, credits = :credits
+    WHERE course_code = :course_code
+      AND (title IS NOT :title OR instructors IS NOT :instructors OR credits IS NOT :credits)
+""")
+# The id is assigned explicitly: courses tables created by the old pandas loader have no
+# INTEGER PRIMARY KEY, so SQLite would not generate one
+INSERT_COURSE = text("""
+    INSERT INTO courses (id, course_code, title, instructors, credits)
+    SELECT (SELECT coalesce(max(id), 0) + 1 FROM courses), :course_code, :title, :instructors, :credits
+    WHERE NOT EXISTS (SELECT 1 FROM courses WHERE course_code = :course_code)
+""")
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0  # Rows without a course_code
+    batches: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "errors": self.errors,
+        }
+
+
+def _parse_credits(value: Optional[str]) -> Optional[int]:
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def iter_course_rows(lines: Iterable[str], report: ImportReport) -> Iterator[dict]:
+    """Yield course parameter dicts from CSV lines; header names are matched case-insensitively."""
+    reader = csv.DictReader(lines)
+    header = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    for line_number, row in enumerate(reader, start=2):
+        report.rows += 1
+        course_code = (row.get(header["course_code"]) or "").strip()
+        if not course_code:
+            report.skipped += 1
+            report.errors.append(f"line {line_number}: missing course_code")
+            continue
+        yield {
+            "course_code": course_code,
+            "title": (row.get(header["title"]) or "").strip(),
+            "instructors": (row.get(header["instructors"]) or "").strip(),
+            "credits": _parse_credits(row.get(header["credits"])) if "credits" in header else None,
+        }
+
+
+def _batches(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = {}
+    for row in rows:
+        batch[row["course_code"]] = row  # The last occurrence of a code within a batch wins
+        if len(batch) >= size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+def import_courses(
+    lines: Iterable[str],
+    db: Session,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None
+) -> ImportReport:
+    """
+    Upsert the courses of a CSV (any iterable of text lines, e.g. an open file) keyed on course_code.
+    Each batch is committed on its own; a failing batch is rolled back and the error re-raised.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    for batch in _batches(iter_course_rows(lines, report), batch_size):
+        try:
+            updated = db.execute(UPDATE_COURSE, batch).rowcount
+            inserted = db.execute(INSERT_COURSE, batch).rowcount
+            if updated or inserted:
+                table_version.bump([table_version.COURSES], db)
+            db.commit()
+            if updated or inserted:
+                course_cache.invalidate()
+        except Exception:
+            db.rollback()
+            raise
+        report.batches += 1
+        report.updated += updated
+        report.inserted += inserted
+        report.unchanged += len(batch) - updated - inserted
+        report.seconds = time.perf_counter() - start
+        if progress is not None:
+            progress(report)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def print_progress(report: ImportReport):
+    print(f"📦 Batch {report.batches}: {report.rows} rows read, {report.inserted} inserted, "
+          f"{report.updated} updated ({report.rows_per_second:.0f} rows/s)")
+
+
+def main(argv: List[str]):
+    """CLI entry point: import a CSV file (default results.csv) into the application database."""
+    import models
+    from database import SessionLocal, engine
+    from migrations import run_migrations, run_post_create_migrations
+
+    path = argv[0] if argv else "results.csv"
+    run_migrations()
+    models.Base.metadata.create_all(engine)
+    run_post_create_migrations()
+
+    db = SessionLocal()
+    try:
+        # utf-8-sig: spreadsheet exports often start with a byte order mark
+        with open(path, newline="", encoding="utf-8-sig") as csv_file:
+            report = import_courses(csv_file, db, progress=print_progress)
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    for error in report.errors:
+        print(f"⚠️ Skipped {error}")
+    print(f"✅ Imported {path}: {report.inserted} inserted, {report.updated} updated, "
+          f"{report.unchanged} unchanged, {report.skipped} skipped "
+          f"in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s)")
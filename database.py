@@ -1,16 +1,78 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import os
 
 SQLALCHEMY_DATABASE_URL = 'sqlite:///./courses.db'
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread":False})
+# SQLite connection profile, applied to every new connection (see apply_sqlite_pragmas).
+# WAL lets readers run while a write is in progress; synchronous=NORMAL is durable in WAL
+# mode except for the last transactions on power loss; busy_timeout makes writers wait
+# for the lock instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", str(64 * 1024)))  # Page cache per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Connections kept open; sized for the request threadpool (40 threads by default) plus overflow for bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """"connect" event handler applying the SQLite profile above to a new DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        # busy_timeout first, so switching the journal mode also waits for a concurrent writer
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KIB}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", apply_sqlite_pragmas)
 
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 Base = declarative_base()
 
+# Async engine (aiosqlite by default; any async driver URL such as postgresql+asyncpg:// works).
+# Disabled unless DB_ASYNC_ENABLED is set, in which case the chat endpoints and their authentication use
+# AsyncSession and the repository/async_* functions (see routers/chatbot.py, oauth2.get_current_user_async).
+# The other routers stay on the sync Session.
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", SQLALCHEMY_DATABASE_URL.replace('sqlite://', 'sqlite+aiosqlite://', 1))
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC_ENABLED:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    # expire_on_commit=False: objects stay readable after commit without an implicit (sync) refresh
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -18,3 +80,6 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
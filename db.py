@@ -1,17 +1,11 @@
-import pandas as pd
-import sqlite3
+"""
+Load results.csv (or the CSV given as argument) into courses.db.
+Safe to re-run: courses are upserted on course_code (see course_import.py).
+Usage: python db.py [path/to/courses.csv]
+"""
+import sys
 
-# 1. Load CSV
-df = pd.read_csv("results.csv")
+from course_import import main
 
-# 2. Keep only the columns that match your DB table
-df = df[["course_code", "title", "instructors"]]   # ← adjust to your actual DB columns
-
-# 3. Connect to existing database
-conn = sqlite3.connect("courses.db")
-
-# 4. Append (don’t replace!) to the existing table
-df.to_sql("courses", conn, if_exists="append", index=False)
-
-conn.close()
-print("✅ CSV data copied to existing database.")
+if __name__ == '__main__':
+    main(sys.argv[1:])
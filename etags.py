@@ -0,0 +1,47 @@
+"""
+Conditional GET support for read endpoints.
+The ETag of a response is derived from the version counter of the data it shows
+(repository/table_version) and the request path and query string, so it can be checked, and a
+304 Not Modified returned, without loading or serializing any rows.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy.orm import Session
+
+from repository import table_version
+
+
+def make_etag(key: str, version: int, variant: str = "") -> str:
+    """Strong ETag for version `version` of `key`; `variant` distinguishes representations (path and query string)"""
+    digest = hashlib.sha1(f"{key}|{version}|{variant}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x". "*" is not honoured: it only
+    # matches when the resource exists, which is not known before the rows are loaded
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def check_not_modified(request: Request, response: Response, key: str, db: Session, version: Optional[int] = None) -> Optional[Response]:
+    """
+    Set the ETag (and revalidation) headers for the data versioned by `key`.
+    Pass `version` when the body is served from a cached snapshot, so the ETag names the snapshot's version.
+    Returns a 304 response to send as-is if the client already has this version, else None.
+    The version is read before the rows, so a concurrent write can only make the ETag older than the body.
+    """
+    if version is None:
+        version = table_version.get(key, db)
+    # Responses of different URLs versioned by the same key (a list, one item, ...) get different ETags
+    etag = make_etag(key, version, f"{request.url.path}?{request.url.query}")
+    # Authenticated data: clients may keep it but must revalidate before reuse
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,95 @@
+"""
+Background text extraction for uploaded material files.
+The upload endpoint hands over a spooled copy of the uploaded file (or, for direct-to-S3
+uploads, the object key to fetch), and a small worker pool parses them and stores the
+result in material_texts, so the chatbot never has to download and parse the file on
+the interactive path.
+"""
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Optional
+
+import database
+import models
+import s3_service
+from repository import material_text
+from text_cache import text_cache
+from text_extraction import extract_file, new_spool, peek, resolve_mime_type, sniff_mime_type
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix="extract")
+
+
+def submit(material_id: int, file_link: str, file: BinaryIO, filename: str, content_type: Optional[str]) -> Optional[Future]:
+    """
+    Queue extraction of an uploaded file. Returns None if the file type is not supported.
+    The file is copied in chunks into a spooled temporary file (the request's upload is
+    closed once the response is sent), so memory use stays bounded for large uploads.
+    """
+    mime_type = resolve_mime_type(filename, content_type) or sniff_mime_type(peek(file))
+    if mime_type is None:
+        print(f"Skipping background extraction for material {material_id}: unsupported file {filename} ({content_type})")
+        return None
+
+    spool = new_spool()
+    file.seek(0)
+    shutil.copyfileobj(file, spool)
+    spool.seek(0)
+    return _executor.submit(_extract_and_store, material_id, file_link, spool, mime_type)
+
+
+def submit_s3_object(material_id: int, file_link: str, key: str, content_type: Optional[str]) -> Optional[Future]:
+    """
+    Queue extraction of a file uploaded directly to S3. The object is downloaded by the
+    worker, not on the request thread. Files of unknown type are identified after download.
+    """
+    return _executor.submit(_download_extract_and_store, material_id, file_link, key, resolve_mime_type(key, content_type))
+
+
+def _download_extract_and_store(material_id: int, file_link: str, key: str, mime_type: Optional[str]):
+    spool = new_spool()
+    try:
+        s3_service.download_fileobj(key, spool)
+        spool.seek(0)
+    except Exception as e:
+        spool.close()
+        print(f"Background download failed for material {material_id}: {e}")
+        return
+    mime_type = mime_type or sniff_mime_type(peek(spool))
+    if mime_type is None:
+        spool.close()
+        print(f"Skipping background extraction for material {material_id}: unsupported file {key}")
+        return
+    _extract_and_store(material_id, file_link, spool, mime_type)
+
+
+def _extract_and_store(material_id: int, file_link: str, spool: BinaryIO, mime_type: str):
+    try:
+        extracted = extract_file(spool, mime_type)
+    except Exception as e:
+        print(f"Background extraction failed for material {material_id}: {e}")
+        return
+    finally:
+        spool.close()
+
+    if not extracted.text.strip():
+        print(f"⚠️ No text extracted for material {material_id} (empty or scanned file)")
+        return
+
+    db = database.SessionLocal()
+    try:
+        # The file may have been replaced again while we were parsing
+        current = db.query(models.CourseMaterial).filter(models.CourseMaterial.id == material_id).first()
+        if not current or current.file_link != file_link:
+            print(f"Discarding extracted text for material {material_id}: file_link changed")
+            return
+        material_text.save(material_id, file_link, extracted.text, extracted.page_count, db)
+        text_cache.put(material_id, file_link, extracted.text)
+        print(f"✅ Extracted {len(extracted.text)} characters for material {material_id} in background")
+    except Exception as e:
+        db.rollback()
+        print(f"Error storing extracted text for material {material_id}: {e}")
+    finally:
+        db.close()
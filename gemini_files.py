@@ -0,0 +1,144 @@
+"""
+Registry of material text uploaded to the Gemini Files API.
+Uploads are keyed by (material_id, content hash) and reused across chat requests
+while the remote file is still alive; a background sweeper deletes files that are
+about to expire, have been idle too long, or belong to an outdated version (the latter
+after a grace period, since a request may still be sending them to the model).
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+# The Files API keeps uploads for 48 hours; this is used when the response carries no expiration time
+GEMINI_FILE_TTL_SECONDS = int(os.getenv("GEMINI_FILE_TTL_SECONDS", str(48 * 3600)))
+# Files not used by any chat request for this long are deleted by the sweeper
+GEMINI_FILE_IDLE_SECONDS = int(os.getenv("GEMINI_FILE_IDLE_SECONDS", str(6 * 3600)))
+GEMINI_FILE_SWEEP_INTERVAL_SECONDS = int(os.getenv("GEMINI_FILE_SWEEP_INTERVAL_SECONDS", "600"))
+# Don't hand out files that expire within this window (a long generation could outlive them)
+EXPIRY_MARGIN_SECONDS = 600
+# Replaced uploads are kept this long, for requests that already referenced them
+GEMINI_FILE_STALE_GRACE_SECONDS = int(os.getenv("GEMINI_FILE_STALE_GRACE_SECONDS", str(EXPIRY_MARGIN_SECONDS)))
+
+
+@dataclass
+class RegisteredFile:
+    file: Any
+    expires_at: float
+    last_used: float = field(default_factory=time.time)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _expiry_timestamp(uploaded_file) -> float:
+    expiration = getattr(uploaded_file, 'expiration_time', None)
+    if expiration is not None:
+        try:
+            return expiration.timestamp()
+        except Exception:
+            pass
+    return time.time() + GEMINI_FILE_TTL_SECONDS
+
+
+class GeminiFileRegistry:
+    def __init__(self):
+        self._files: dict[tuple[int, str], RegisteredFile] = {}
+        self._stale: list[tuple[float, Any]] = []  # (replaced at, file) awaiting deletion by the sweeper
+        self._lock = threading.Lock()
+        self._client = None
+        self._sweeper = None
+
+    def get_or_upload(self, client, material_id: int, display_name: str, text: str):
+        """Return a live Gemini file holding `text`, uploading it only if no valid upload exists."""
+        key = (material_id, content_hash(text))
+        now = time.time()
+        with self._lock:
+            registered = self._files.get(key)
+            if registered and registered.expires_at - EXPIRY_MARGIN_SECONDS > now:
+                registered.last_used = now
+                print(f"Reusing Gemini file {registered.file.name} for material {material_id}")
+                return registered.file
+
+        uploaded_file = client.files.upload(
+            file=io.BytesIO(text.encode('utf-8')),
+            config={
+                'mime_type': 'text/plain',
+                'display_name': display_name
+            }
+        )
+
+        duplicate = []
+        with self._lock:
+            # Another request may have uploaded the same content meanwhile; keep the first one
+            current = self._files.get(key)
+            if current and current.expires_at - EXPIRY_MARGIN_SECONDS > now:
+                # Our upload was never handed out, so it can go right away
+                duplicate.append(uploaded_file)
+                uploaded_file = current.file
+            else:
+                if current:
+                    self._stale.append((now, current.file))
+                self._files[key] = RegisteredFile(uploaded_file, _expiry_timestamp(uploaded_file))
+            # Older versions of this material's text will never be handed out again, but requests
+            # that already got them may still be using them; the sweeper deletes them later
+            for other_key in [k for k in self._files if k[0] == material_id and k != key]:
+                self._stale.append((now, self._files.pop(other_key).file))
+        self._start_sweeper(client)
+
+        self._delete(client, duplicate)
+        return uploaded_file
+
+    def sweep(self, client=None) -> int:
+        """
+        Delete expired or idle uploads, and replaced ones past their grace period.
+        Returns the number of files removed from the registry.
+        """
+        client = client or self._client
+        now = time.time()
+        with self._lock:
+            expired = [
+                key for key, registered in self._files.items()
+                if registered.expires_at - EXPIRY_MARGIN_SECONDS <= now
+                or now - registered.last_used > GEMINI_FILE_IDLE_SECONDS
+            ]
+            removed = [self._files.pop(key).file for key in expired]
+            removed += [stale_file for replaced_at, stale_file in self._stale if now - replaced_at >= GEMINI_FILE_STALE_GRACE_SECONDS]
+            self._stale = [(replaced_at, stale_file) for replaced_at, stale_file in self._stale if now - replaced_at < GEMINI_FILE_STALE_GRACE_SECONDS]
+        if client is not None:
+            self._delete(client, removed)
+        return len(removed)
+
+    def _start_sweeper(self, client):
+        with self._lock:
+            self._client = client
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, name="gemini-file-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(GEMINI_FILE_SWEEP_INTERVAL_SECONDS)
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"Swept {removed} Gemini files")
+            except Exception as e:
+                print(f"Error sweeping Gemini files: {e}")
+
+    @staticmethod
+    def _delete(client, files):
+        for uploaded_file in files:
+            try:
+                print(f"Cleaning up uploaded file: {uploaded_file.name}")
+                client.files.delete(name=uploaded_file.name)
+            except Exception as e:
+                print(f"Error deleting file {uploaded_file.name}: {e}")
+
+
+registry = GeminiFileRegistry()
@@ -1,20 +1,163 @@
+import asyncio
 import bcrypt
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+
+# bcrypt cost factor for new hashes; existing hashes with another cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Dedicated processes for hashing, so bcrypt never competes with request threads
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash jobs allowed to be running or queued at once; beyond that requests get 429.
+# Callers await the jobs on the event loop, so pending jobs do not hold request threads.
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+HASH_TIMEOUT_SECONDS = 30
+
+
+def _hashpw(password_bytes: bytes, rounds: int) -> bytes:
+    # Generate salt and hash password
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password_bytes: bytes, hashed_bytes: bytes) -> bool:
+    return bcrypt.checkpw(password_bytes, hashed_bytes)
+
+
+class HashPool:
+    """Size-limited process pool for bcrypt with backpressure and basic metrics."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self._restarts = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a multi-threaded server process can deadlock the children
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        """Drop a pool whose worker died (e.g. OOM-killed) so the next job spawns a fresh one."""
+        with self._lock:
+            # Concurrent jobs see the same broken pool; only the first one replaces it
+            if self._executor is broken:
+                self._executor = None
+                self._restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _unavailable() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service temporarily unavailable, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    async def run(self, fn, *args):
+        """
+        Run fn(*args) on the pool and await it; the calling thread (event loop) stays free
+        while the job is queued or running. Raises 429 when the queue is full.
+        A job hit by a broken pool is retried once on a fresh pool, then fails with 503;
+        a job not done within HASH_TIMEOUT_SECONDS (overloaded pool) also fails with 503.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        start = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        succeeded = False
+        try:
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(fn, *args)
+                    result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=HASH_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    print(f"Hashing job timed out after {HASH_TIMEOUT_SECONDS}s")
+                    raise self._unavailable()
+                except BrokenProcessPool:
+                    print("Hashing pool broken (worker process died), restarting it")
+                    self._reset_executor(executor)
+                    if attempt:
+                        raise self._unavailable()
+                    continue
+                succeeded = True
+                return result
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                if succeeded:
+                    self._completed += 1
+                    self._total_latency += latency
+                    self._max_latency = max(self._max_latency, latency)
+                else:
+                    self._failed += 1
+            self._slots.release()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self._in_flight,  # running + waiting jobs
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "restarts": self._restarts,
+                "avg_latency_ms": round(self._total_latency / self._completed * 1000, 2) if self._completed else 0.0,
+                "max_latency_ms": round(self._max_latency * 1000, 2),
+            }
+
+
+hash_pool = HashPool(HASH_WORKERS, HASH_MAX_PENDING)
+
 
 class Hash():
     @staticmethod
-    def bcrypt(password: str) -> str:
-        # Convert password to bytes and hash it
+    async def bcrypt(password: str) -> str:
+        # Convert password to bytes and hash it on the hashing pool
         password_bytes = password.encode('utf-8')
-        # Generate salt and hash password
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password_bytes, salt)
+        hashed_password = await hash_pool.run(_hashpw, password_bytes, BCRYPT_ROUNDS)
         # Return as string (bcrypt hash includes salt)
         return hashed_password.decode('utf-8')
-    
+
     @staticmethod
-    def verify(plain_password: str, hashed_password: str) -> bool:
+    async def verify(plain_password: str, hashed_password: str) -> bool:
         # Convert both to bytes
         password_bytes = plain_password.encode('utf-8')
         hashed_bytes = hashed_password.encode('utf-8')
-        # Verify password
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
\ No newline at end of file
+        # Verify password on the hashing pool
+        return await hash_pool.run(_checkpw, password_bytes, hashed_bytes)
+
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        """True if the hash was made with a different cost than BCRYPT_ROUNDS (format: $2b$<cost>$...)"""
+        try:
+            return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+        except (IndexError, ValueError):
+            return False
@@ -0,0 +1,55 @@
+"""
+Shared HTTP session for downloading material files.
+One requests.Session with a pooled HTTPAdapter keeps connections to the storage host
+alive between downloads, so a chat over several materials of the same bucket does one
+TCP/TLS handshake instead of one per file. Transient failures (connection errors, 429
+and 5xx responses) are retried with exponential backoff.
+"""
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Hosts whose connection pools are kept
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "8"))
+# Idle connections kept per host for reuse; covers chat fetches plus extraction workers
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))  # Sleeps 0.5s, 1s, 2s, ...
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))  # Per socket read, not for the whole body
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_SECONDS,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False  # The last response is returned and raise_for_status() reports it
+    )
+    # pool_block=False: when every pooled connection is busy, open an extra one (closed after use)
+    # rather than wait, since urllib3 would wait for a free connection without any timeout
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+        pool_block=False
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = _build_session()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    return session.get(url, **kwargs)
+
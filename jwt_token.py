@@ -25,7 +25,10 @@ def verify_token(token: str, credentials_exception):
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        user_id = payload.get("uid")
+        if user_id is not None and not isinstance(user_id, int):
+            raise credentials_exception
+        token_data = schemas.TokenData(email=email, user_id=user_id, name=payload.get("name"))
         return token_data
     except jwt.InvalidTokenError:
         raise credentials_exception
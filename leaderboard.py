@@ -0,0 +1,143 @@
+"""
+In-memory karma rankings (global and per course).
+Rankings are loaded from the database once, then updated incrementally as karma is
+awarded (see repository/user.karma_committed), so serving a leaderboard or a user's
+rank does not sort the users table. Each ranking is a list kept sorted by
+(-karma, user_id): a rank is found with a binary search.
+Every process keeps its own copy, so rankings are reloaded every
+LEADERBOARD_REFRESH_SECONDS to pick up karma awarded by other workers.
+"""
+import bisect
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+
+LEADERBOARD_REFRESH_SECONDS = int(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60"))
+
+
+class Ranking:
+    """Users ordered by score (highest first, ties by user id)."""
+
+    def __init__(self, scores: Iterable[Tuple[int, int]]):
+        self._scores: Dict[int, int] = {user_id: score or 0 for user_id, score in scores}
+        self._keys: List[Tuple[int, int]] = sorted((-score, user_id) for user_id, score in self._scores.items())
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.loaded_at > LEADERBOARD_REFRESH_SECONDS
+
+    def score(self, user_id: int) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def set(self, user_id: int, score: int):
+        """Move a user to `score`; users not in the ranking yet are inserted."""
+        current = self._scores.get(user_id)
+        if current == score:
+            return
+        if current is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-current, user_id))]
+        bisect.insort(self._keys, (-score, user_id))
+        self._scores[user_id] = score
+
+    def add(self, user_id: int, points: int):
+        self.set(user_id, (self._scores.get(user_id) or 0) + points)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank; users with the same score share a rank."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        # (-score,) sorts before every (-score, user_id), so this counts users with a higher score
+        return bisect.bisect_left(self._keys, (-score,)) + 1
+
+    def top(self, limit: int) -> List[Tuple[int, int, int]]:
+        """[(rank, user_id, score)] of the first `limit` users."""
+        entries = []
+        for position, (negative_score, user_id) in enumerate(self._keys[:limit]):
+            if entries and entries[-1][2] == -negative_score:
+                rank = entries[-1][0]
+            else:
+                rank = position + 1
+            entries.append((rank, user_id, -negative_score))
+        return entries
+
+
+class Leaderboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global: Optional[Ranking] = None
+        self._courses: Dict[int, Ranking] = {}
+
+    def _global_ranking(self, db: Session) -> Ranking:
+        # Called with the lock held
+        if self._global is None or self._global.is_stale():
+            self._global = Ranking(db.query(models.User.id, func.coalesce(models.User.karma, 0)).all())
+        return self._global
+
+    def _course_ranking(self, course_id: int, db: Session) -> Ranking:
+        # Called with the lock held
+        ranking = self._courses.get(course_id)
+        if ranking is None or ranking.is_stale():
+            # Karma of the materials currently in the course, credited to their uploaders:
+            # moved materials count for their new course and deleted ones no longer count
+            ranking = Ranking(
+                db.query(models.CourseMaterial.user_id, func.sum(models.KarmaLedger.points))
+                .join(models.KarmaLedger, models.KarmaLedger.material_id == models.CourseMaterial.id)
+                .filter(models.CourseMaterial.course_id == course_id, models.CourseMaterial.user_id.isnot(None))
+                .group_by(models.CourseMaterial.user_id)
+                .all()
+            )
+            self._courses[course_id] = ranking
+        return ranking
+
+    def record(self, user_id: int, points: int, course_id: Optional[int] = None):
+        """Apply committed karma to the rankings already in memory."""
+        with self._lock:
+            if self._global is not None:
+                self._global.add(user_id, points)
+            if course_id is not None and course_id in self._courses:
+                self._courses[course_id].add(user_id, points)
+
+    def rank(self, user_id: int, karma: int, db: Session) -> int:
+        """Global rank of a user whose current karma (read from the database) is `karma`."""
+        with self._lock:
+            ranking = self._global_ranking(db)
+            # Karma awarded by another process shows up here before the next reload
+            ranking.set(user_id, karma or 0)
+            return ranking.rank(user_id)
+
+    def top(self, db: Session, limit: int, course_id: Optional[int] = None) -> List[dict]:
+        """The first `limit` entries of the global or course leaderboard, with user names."""
+        with self._lock:
+            ranking = self._global_ranking(db) if course_id is None else self._course_ranking(course_id, db)
+            entries = ranking.top(limit)
+
+        user_ids = [user_id for _, user_id, _ in entries]
+        names = dict(db.query(models.User.id, models.User.name).filter(models.User.id.in_(user_ids)).all()) if user_ids else {}
+        return [
+            {"rank": rank, "user_id": user_id, "name": names.get(user_id), "karma": score}
+            for rank, user_id, score in entries
+        ]
+
+    def invalidate_courses(self, course_ids: Iterable[int]):
+        """Drop course rankings so they are reloaded (called after materials move between courses or are deleted)."""
+        with self._lock:
+            for course_id in course_ids:
+                self._courses.pop(course_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._global = None
+            self._courses.clear()
+
+
+leaderboard = Leaderboard()
@@ -5,8 +5,8 @@ from fastapi.exceptions import RequestValidationError
 import traceback
 import models
 from database import engine
-from routers import course, user, authentication, material, chatbot
-from migrations import run_migrations
+from routers import course, user, authentication, material, chatbot, leaderboard
+from migrations import run_migrations, run_post_create_migrations
 
 app = FastAPI()
 
@@ -58,8 +58,12 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Existing databases will have karma column from migration above
 models.Base.metadata.create_all(engine)
 
+# Indexes, search index/triggers and data backfills on top of the tables created above
+run_post_create_migrations()
+
 app.include_router(course.router)
 app.include_router(user.router)
 app.include_router(authentication.router)
 app.include_router(material.router)
 app.include_router(chatbot.router)
+app.include_router(leaderboard.router)
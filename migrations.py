@@ -6,21 +6,25 @@ import sqlite3
 import os
 from database import SQLALCHEMY_DATABASE_URL
 
+def get_db_path():
+    """Extract the SQLite database file path from the SQLAlchemy URL"""
+    # SQLAlchemy URL format: 'sqlite:///./courses.db'
+    db_path = SQLALCHEMY_DATABASE_URL.replace('sqlite:///', '')
+    
+    # Handle relative paths
+    if db_path.startswith('./'):
+        db_path = db_path[2:]
+    elif not os.path.isabs(db_path):
+        db_path = os.path.join(os.getcwd(), db_path)
+    return db_path
+
 def add_karma_column_if_not_exists():
     """
     Add karma column to users table if it doesn't exist.
     This ensures backward compatibility with existing databases.
     """
     try:
-        # Extract database path from SQLAlchemy URL
-        # SQLAlchemy URL format: 'sqlite:///./courses.db'
-        db_path = SQLALCHEMY_DATABASE_URL.replace('sqlite:///', '')
-        
-        # Handle relative paths
-        if db_path.startswith('./'):
-            db_path = db_path[2:]
-        elif not os.path.isabs(db_path):
-            db_path = os.path.join(os.getcwd(), db_path)
+        db_path = get_db_path()
         
         # Check if database file exists
         if not os.path.exists(db_path):
@@ -58,15 +62,182 @@ def add_karma_column_if_not_exists():
         # Don't fail if migration fails - the code will handle missing karma gracefully
         return False
 
+def add_course_credits_column_if_not_exists():
+    """
+    Add the credits column to the courses table if it doesn't exist.
+    New databases get it from create_all, so a missing courses table is skipped.
+    """
+    try:
+        db_path = get_db_path()
+        if not os.path.exists(db_path):
+            return True
+        
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(courses)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if columns and 'credits' not in columns:
+            print("📝 Adding credits column to courses table...")
+            cursor.execute("ALTER TABLE courses ADD COLUMN credits INTEGER")
+            conn.commit()
+            print("✅ Successfully added credits column to courses table")
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"⚠️ Error checking/adding credits column: {e}")
+        return False
+
+def add_material_file_columns_if_not_exist():
+    """
+    Add the content_type and file_size columns to the course_materials table if they don't exist.
+    Materials uploaded before have NULLs; their type is then found from the link or the file itself.
+    """
+    try:
+        db_path = get_db_path()
+        if not os.path.exists(db_path):
+            return True
+        
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(course_materials)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if columns:
+            for column, definition in (("content_type", "VARCHAR"), ("file_size", "INTEGER")):
+                if column not in columns:
+                    print(f"📝 Adding {column} column to course_materials table...")
+                    cursor.execute(f"ALTER TABLE course_materials ADD COLUMN {column} {definition}")
+            conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"⚠️ Error checking/adding course_materials file columns: {e}")
+        return False
+
 def run_migrations():
     """
     Run all database migrations
     """
     print("🔄 Running database migrations...")
     success = add_karma_column_if_not_exists()
+    success = add_course_credits_column_if_not_exists() and success
+    success = add_material_file_columns_if_not_exist() and success
     if success:
         print("✅ Migrations complete")
     else:
         print("⚠️ Some migrations may have failed, but continuing anyway...")
     return success
 
+def create_course_search_index():
+    """
+    Create the courses_fts full-text index (SQLite FTS5) and the triggers that keep it
+    in sync with the courses table on every insert, update and delete.
+    The FTS rowid is the course id. Needs the courses table, so it runs after create_all.
+    """
+    try:
+        conn = sqlite3.connect(get_db_path())
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'courses'")
+        if cursor.fetchone() is None:
+            print("ℹ️ courses table does not exist yet, skipping search index")
+            conn.close()
+            return True
+        
+        cursor.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+                course_code, title, instructors,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '1 2 3'
+            );
+            CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses BEGIN
+                INSERT INTO courses_fts(rowid, course_code, title, instructors)
+                VALUES (new.id, new.course_code, new.title, new.instructors);
+            END;
+            CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses BEGIN
+                DELETE FROM courses_fts WHERE rowid = old.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS courses_fts_update AFTER UPDATE ON courses BEGIN
+                DELETE FROM courses_fts WHERE rowid = old.id;
+                INSERT INTO courses_fts(rowid, course_code, title, instructors)
+                VALUES (new.id, new.course_code, new.title, new.instructors);
+            END;
+        """)
+        
+        # (Re)build the index if it is out of step, e.g. on first run or after rows were loaded without triggers
+        indexed = cursor.execute("SELECT count(*) FROM courses_fts").fetchone()[0]
+        total = cursor.execute("SELECT count(*) FROM courses WHERE id IS NOT NULL").fetchone()[0]
+        if indexed != total:
+            print(f"📝 Building course search index ({total} courses)...")
+            cursor.execute("DELETE FROM courses_fts")
+            cursor.execute("""
+                INSERT INTO courses_fts(rowid, course_code, title, instructors)
+                SELECT id, course_code, title, instructors FROM courses WHERE id IS NOT NULL
+            """)
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not create course search index (search will fall back to LIKE): {e}")
+        return False
+
+def create_missing_indexes():
+    """
+    Create indexes declared in models.py that older databases lack.
+    The courses table of databases seeded by the old pandas script has no index on id,
+    which keyset pagination (ORDER BY id / id > cursor) relies on, and users.email
+    (used by login and authentication) was not indexed originally.
+    """
+    indexes = [
+        ("courses", "CREATE INDEX IF NOT EXISTS ix_courses_id ON courses (id)"),
+        ("users", "CREATE INDEX IF NOT EXISTS ix_users_email ON users (email)"),
+    ]
+    try:
+        conn = sqlite3.connect(get_db_path())
+        cursor = conn.cursor()
+        for table, statement in indexes:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            if cursor.fetchone() is not None:
+                cursor.execute(statement)
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not create indexes: {e}")
+        return False
+
+def backfill_karma_ledger():
+    """
+    Record karma_ledger entries for materials uploaded before the ledger existed.
+    Uploads are the only source of karma so far, so each material gets one
+    'material_upload' entry of MATERIAL_UPLOAD_KARMA points for its uploader.
+    """
+    from repository.material import MATERIAL_UPLOAD_KARMA
+    try:
+        conn = sqlite3.connect(get_db_path())
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO karma_ledger (user_id, points, reason, material_id, course_id, created_at)
+            SELECT m.user_id, ?, 'material_upload', m.id, m.course_id, CURRENT_TIMESTAMP
+            FROM course_materials m
+            WHERE m.user_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM karma_ledger k WHERE k.material_id = m.id)
+        """, (MATERIAL_UPLOAD_KARMA,))
+        if cursor.rowcount:
+            print(f"📝 Backfilled {cursor.rowcount} karma ledger entries")
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not backfill karma ledger: {e}")
+        return False
+
+def run_post_create_migrations():
+    """
+    Run migrations that need the tables created by SQLAlchemy's create_all
+    """
+    indexes_ok = create_missing_indexes()
+    search_ok = create_course_search_index()
+    ledger_ok = backfill_karma_ledger()
+    return indexes_ok and search_ok and ledger_ok
@@ -1,5 +1,5 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, DateTime, func
 
 class Course(Base):
     __tablename__ = 'courses'
@@ -8,13 +8,14 @@ class Course(Base):
     course_code = Column(String, unique=True, index=True)
     title = Column(String)
     instructors = Column(String)  # Storing as comma-separated string or JSON
+    credits = Column(Integer, nullable=True)
 
 class User(Base):
     __tablename__ = 'users'
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
-    email = Column(String)
+    email = Column(String, index=True)
     password = Column(String)
     karma = Column(Integer, default=0)  # User karma points (earned by uploading materials)
 
@@ -29,4 +30,33 @@ class CourseMaterial(Base):
     role = Column(Boolean)  # Role/permission flag
     score = Column(Integer)
     file_link = Column(String)  # Link to file (for future S3 integration)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True)  # User who created/submitted this material
\ No newline at end of file
+    content_type = Column(String, nullable=True)  # MIME type of the file, recorded at upload
+    file_size = Column(Integer, nullable=True)  # Bytes, recorded at upload
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)  # User who created/submitted this material
+
+class MaterialText(Base):
+    __tablename__ = 'material_texts'
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("course_materials.id"), unique=True, index=True)
+    file_link = Column(String)  # file_link the text was extracted from (acts as the file version)
+    content = Column(Text)
+    page_count = Column(Integer, nullable=True)  # Only known for PDFs
+    char_count = Column(Integer)
+
+class KarmaLedger(Base):
+    __tablename__ = 'karma_ledger'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    points = Column(Integer)
+    reason = Column(String)  # Why the points were awarded (e.g. 'material_upload')
+    material_id = Column(Integer, ForeignKey("course_materials.id"), nullable=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=True, index=True)
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+
+class TableVersion(Base):
+    __tablename__ = 'table_versions'
+
+    key = Column(String, primary_key=True)  # Table name, or table:scope (e.g. course_materials:3)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,21 +1,80 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import os
 import jwt_token as token
 import database
-import models
+from user_cache import CurrentUser, user_cache
+from repository import async_user, user as user_repository
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token_line: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-   credentials_exception = HTTPException(
+# When enabled, tokens carrying the user id and name ('uid'/'name' claims) are trusted
+# without a DB lookup. A deleted user then keeps access until the token expires.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# Comma-separated emails of the users allowed to call admin endpoints
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+def _credentials_exception() -> HTTPException:
+   return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _user_without_lookup(token_data) -> Optional[CurrentUser]:
+   """The user of a verified token when it is known without a DB lookup (cache or trusted claims)"""
+   cached = user_cache.get(token_data.email)
+   if cached is not None:
+       return cached
+   
+   if AUTH_TRUST_TOKEN_CLAIMS and token_data.user_id is not None:
+       return CurrentUser(id=token_data.user_id, name=token_data.name, email=token_data.email)
+   return None
+
+
+def get_current_user(token_line: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)) -> CurrentUser:
+   credentials_exception = _credentials_exception()
    
    token_data = token.verify_token(token_line, credentials_exception)
-   user = db.query(models.User).filter(models.User.email == token_data.email).first()
+   
+   known = _user_without_lookup(token_data)
+   if known is not None:
+       return known
+   
+   user = user_repository.get_for_token(token_data.user_id, token_data.email, db)
    if user is None:
        raise credentials_exception
-   return user
\ No newline at end of file
+   
+   current_user = CurrentUser.from_model(user)
+   user_cache.put(token_data.email, current_user)
+   return current_user
+
+
+async def get_current_user_async(token_line: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)) -> CurrentUser:
+   """get_current_user on an AsyncSession, for endpoints that run without the threadpool (database.DB_ASYNC_ENABLED)"""
+   credentials_exception = _credentials_exception()
+   
+   token_data = token.verify_token(token_line, credentials_exception)
+   
+   known = _user_without_lookup(token_data)
+   if known is not None:
+       return known
+   
+   user = await async_user.get_for_token(token_data.user_id, token_data.email, db)
+   if user is None:
+       raise credentials_exception
+   
+   current_user = CurrentUser.from_model(user)
+   user_cache.put(token_data.email, current_user)
+   return current_user
+
+
+def get_current_admin(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+   if current_user.email.lower() not in ADMIN_EMAILS:
+       raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+   return current_user
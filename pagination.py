@@ -0,0 +1,76 @@
+"""
+Keyset (id-based) pagination for list endpoints.
+The body stays a plain JSON list; the cursor of the next page and the optional total
+count are returned in the X-Next-Cursor and X-Total-Count response headers.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response, status
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+@dataclass
+class Page:
+    limit: int
+    after_id: Optional[int]
+    include_total: bool
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        after_id = json.loads(base64.urlsafe_b64decode(padded))["after"]
+        if not isinstance(after_id, int):
+            raise ValueError("cursor id must be an integer")
+        return after_id
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid cursor: {e}")
+
+
+def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    include_total: bool = Query(True, description="Compute the total item count (X-Total-Count header)")
+) -> Page:
+    """FastAPI dependency reading the pagination query parameters"""
+    return Page(
+        limit=limit,
+        after_id=decode_cursor(cursor) if cursor else None,
+        include_total=include_total
+    )
+
+
+def set_page_headers(response: Response, next_id: Optional[int], total: Optional[int]):
+    if next_id is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_id)
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+
+def paginate(query, id_column, page: Page, response: Response) -> list:
+    """
+    Return one page of `query` ordered by `id_column` and set the pagination headers.
+    Fetches one extra row to know whether a next page exists.
+    """
+    total = query.order_by(None).count() if page.include_total else None
+    if page.after_id is not None:
+        query = query.filter(id_column > page.after_id)
+    rows = query.order_by(id_column).limit(page.limit + 1).all()
+
+    next_id = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_id = rows[-1].id
+    set_page_headers(response, next_id, total)
+    return rows
@@ -0,0 +1,11 @@
+"""
+Async course reads for an AsyncSession (database.DB_ASYNC_ENABLED).
+Statements come from repository/course; writes go through the sync functions there.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from repository import course
+
+async def get(id: int, db: AsyncSession):
+    """The course with this id read from the database, or None"""
+    return (await db.execute(course.select_by_id(id))).scalars().first()
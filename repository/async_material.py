@@ -0,0 +1,28 @@
+"""
+Async material reads (and extracted text storage) for an AsyncSession (database.DB_ASYNC_ENABLED).
+Statements and row handling come from repository/material and repository/material_text;
+other writes go through the sync functions there.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+import models
+from repository import material, material_text
+
+async def get_many(ids: List[int], db: AsyncSession) -> dict:
+    """The existing materials among `ids`, by id, loaded with one IN query"""
+    if not ids:
+        return {}
+    return {m.id: m for m in (await db.execute(material.select_many(ids))).scalars()}
+
+async def get_text(material_id: int, file_link: str, db: AsyncSession) -> Optional[models.MaterialText]:
+    """Get the precomputed text of a material, only if it matches the material's current file_link"""
+    return (await db.execute(material_text.select_current(material_id, file_link))).scalars().first()
+
+async def save_text(material_id: int, file_link: str, content: str, page_count: Optional[int], db: AsyncSession):
+    """Insert or replace the extracted text of a material"""
+    row = (await db.execute(material_text.select_row(material_id))).scalars().first()
+    row = material_text.new_or_update(row, material_id, file_link, content, page_count)
+    db.add(row)
+    await db.commit()
+    return row
@@ -0,0 +1,14 @@
+"""
+Async user reads for an AsyncSession (database.DB_ASYNC_ENABLED).
+Statements come from repository/user; writes go through the sync functions there.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from repository import user
+
+async def get_for_token(user_id: Optional[int], email: str, db: AsyncSession):
+    """The user a token was issued to, or None (see repository.user.select_for_token)"""
+    # The async session does not expire objects on commit, so refresh a user it already holds
+    query = user.select_for_token(user_id, email).execution_options(populate_existing=True)
+    return (await db.execute(query)).scalars().first()
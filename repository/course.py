@@ -1,35 +1,84 @@
 from sqlalchemy.orm import Session
 from fastapi import Response, status, HTTPException
-from sqlalchemy import or_
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+import re
 
 import schemas
 import models
+import pagination
+from course_cache import Catalogue, course_cache
+from repository import table_version
 
-def all(db: Session):
-    courses = db.query(models.Course).all()
-    return courses
+# Maximum number of ranked results returned by search
+SEARCH_RESULT_LIMIT = 100
 
-def search(query: str, db: Session):
+def all(catalogue: Catalogue, page: pagination.Page, response: Response):
+    """One page of courses ordered by id (see pagination.py), served from a cached catalogue (course_cache.get)"""
+    rows = catalogue.page(page.after_id, page.limit + 1)
+    next_id = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_id = rows[-1]["id"]
+    pagination.set_page_headers(response, next_id, len(catalogue.courses) if page.include_total else None)
+    return rows
+
+def search(query: str, db: Session, catalogue: Catalogue):
     """
-    Search courses by course_code, title, or instructors.
-    Returns courses that match any of these fields (case-insensitive partial match).
+    Search courses by course_code, title, or instructors; the matching courses are taken from `catalogue`.
+    Uses the courses_fts full-text index: every word of the query must match the start of
+    a word in one of these fields (so "comp prog" finds "Computer Programming").
+    Results are ranked best match first, course_code matches weighing most.
     """
-    search_term = f"%{query}%"
-    courses = db.query(models.Course).filter(
-        or_(
-            models.Course.course_code.ilike(search_term),
-            models.Course.title.ilike(search_term),
-            models.Course.instructors.ilike(search_term)
-        )
-    ).all()
-    return courses 
+    match = _fts_match_expression(query)
+    if match is None:
+        return []
+    try:
+        rows = db.execute(
+            text(
+                "SELECT rowid FROM courses_fts WHERE courses_fts MATCH :match "
+                "ORDER BY bm25(courses_fts, 10.0, 5.0, 1.0) LIMIT :limit"
+            ),
+            {"match": match, "limit": SEARCH_RESULT_LIMIT}
+        ).fetchall()
+    except OperationalError as e:
+        # Search index missing (e.g. SQLite without FTS5): fall back to a scan
+        db.rollback()
+        print(f"Full-text search unavailable, falling back to LIKE: {e}")
+        return _search_like(query, catalogue)
+    
+    courses = catalogue.by_id
+    return [courses[row[0]] for row in rows if row[0] in courses]
 
-def show(id:int, response: Response, db: Session):
-    course = db.query(models.Course).filter(models.Course.id == id).first()
+def _fts_match_expression(query: str):
+    """Turn free text into an FTS5 query of quoted prefix terms, e.g. 'csc 16' -> '"csc"* "16"*'"""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _search_like(query: str, catalogue: Catalogue):
+    """Case-insensitive partial match on any of the fields (scan of the cached catalogue)"""
+    term = query.lower()
+    return [
+        course for course in catalogue.courses
+        if any(term in (course[field] or "").lower() for field in ("course_code", "title", "instructors"))
+    ]
+
+def show(id:int, catalogue: Catalogue):
+    course = catalogue.by_id.get(id)
     if not course:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with the id {id} is not available")
     return course 
 
+def select_by_id(id: int):
+    """Statement for one course read from the database (not from the cached catalogue)"""
+    return select(models.Course).where(models.Course.id == id)
+
+def get(id: int, db: Session):
+    """The course with this id read from the database, or None"""
+    return db.execute(select_by_id(id)).scalars().first()
+
 def create(request:schemas.Course, db:Session):
     # Check if course_code already exists
     existing_course = db.query(models.Course).filter(models.Course.course_code == request.course_code).first()
@@ -39,10 +88,13 @@ def create(request:schemas.Course, db:Session):
     new_course = models.Course(
         course_code=request.course_code,
         title=request.title,
-        instructors=request.instructors
+        instructors=request.instructors,
+        credits=request.credits
     )
     db.add(new_course)
+    table_version.bump([table_version.COURSES], db)
     db.commit()
+    course_cache.invalidate()
     db.refresh(new_course)
     return new_course
 
@@ -51,7 +103,9 @@ def destroy(id:int, db: Session):
     if not course.first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with id {id} not found")
     course.delete(synchronize_session=False)
+    table_version.bump([table_version.COURSES], db)
     db.commit()
+    course_cache.invalidate()
     return {'done'}
 
 def update(id:int, request: schemas.Course, db:Session):
@@ -68,7 +122,10 @@ def update(id:int, request: schemas.Course, db:Session):
     course.course_code = request.course_code
     course.title = request.title
     course.instructors = request.instructors
+    course.credits = request.credits
+    table_version.bump([table_version.COURSES], db)
     db.commit()
+    course_cache.invalidate()
     db.refresh(course)
     return course
 
@@ -1,17 +1,45 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import Response, status, HTTPException
+from collections import Counter
+from typing import List
+import os
 
 import schemas
 import models
+import pagination
+import fast_json
+from repository import material_text, table_version, user
+from text_cache import text_cache
+from leaderboard import leaderboard
 
-def all(db: Session):
-    materials = db.query(models.CourseMaterial).all()
-    return materials
+# Karma awarded to a user for each material they upload
+MATERIAL_UPLOAD_KARMA = 10
+# Maximum number of items in one bulk create/update request
+MATERIAL_BULK_MAX_ITEMS = int(os.getenv("MATERIAL_BULK_MAX_ITEMS", "500"))
 
-def get_by_course(course_id: int, db: Session):
-    """Get all materials for a specific course"""
-    materials = db.query(models.CourseMaterial).filter(models.CourseMaterial.course_id == course_id).all()
-    return materials
+def _list_query(db: Session):
+    # Only the ShowCourseMaterial columns, as plain rows (see fast_json.py)
+    return db.query(*fast_json.schema_columns(models.CourseMaterial, schemas.ShowCourseMaterial))
+
+def all(db: Session, page: pagination.Page, response: Response):
+    """One page of materials ordered by id (see pagination.py), as ShowCourseMaterial dicts"""
+    return fast_json.rows_as_dicts(pagination.paginate(_list_query(db), models.CourseMaterial.id, page, response))
+
+def get_by_course(course_id: int, db: Session, page: pagination.Page, response: Response):
+    """Get one page of the materials of a specific course, as ShowCourseMaterial dicts"""
+    query = _list_query(db).filter(models.CourseMaterial.course_id == course_id)
+    return fast_json.rows_as_dicts(pagination.paginate(query, models.CourseMaterial.id, page, response))
+
+def select_many(ids):
+    """Statement for the existing materials among `ids`"""
+    return select(models.CourseMaterial).where(models.CourseMaterial.id.in_(set(ids)))
+
+def get_many(ids: List[int], db: Session) -> dict:
+    """The existing materials among `ids`, by id, loaded with one IN query"""
+    if not ids:
+        return {}
+    return {m.id: m for m in db.execute(select_many(ids)).scalars()}
 
 def show(id: int, response: Response, db: Session):
     material = db.query(models.CourseMaterial).filter(models.CourseMaterial.id == id).first()
@@ -36,25 +64,154 @@ def create(request: schemas.CourseMaterial, user_id: int, db: Session):
         user_id=user_id
     )
     db.add(new_material)
+    db.flush()  # Assigns new_material.id for the ledger entry
+    
+    # Award karma to user for uploading material, in the same transaction as the insert
+    user.add_karma(user_id, MATERIAL_UPLOAD_KARMA, db, reason='material_upload',
+                   material_id=new_material.id, course_id=new_material.course_id, commit=False)
+    table_version.bump([table_version.course_materials(new_material.course_id)], db)
     db.commit()
     db.refresh(new_material)
-    
-    # Award karma to user for uploading material (+10 points)
-    from repository import user
-    try:
-        user.add_karma(user_id, 10, db)
-    except Exception as e:
-        # Log error but don't fail material creation if karma update fails
-        print(f"Error updating karma: {e}")
+    user.karma_committed(user_id, MATERIAL_UPLOAD_KARMA, new_material.course_id)
     
     return new_material
 
+def _check_bulk_size(count: int):
+    if count > MATERIAL_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MATERIAL_BULK_MAX_ITEMS} materials per request, got {count}")
+
+def _existing_course_ids(course_ids, db: Session) -> set:
+    """The subset of course_ids that exist, with one IN query"""
+    if not course_ids:
+        return set()
+    return {row[0] for row in db.query(models.Course.id).filter(models.Course.id.in_(course_ids)).all()}
+
+def _bulk_response(results: list, karma_awarded: int = 0) -> dict:
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {"succeeded": len(results) - failed, "failed": failed, "karma_awarded": karma_awarded, "results": results}
+
+def create_many(requests: List[schemas.CourseMaterial], user_id: int, db: Session):
+    """
+    Create several materials in one transaction: course ids are checked with one IN query,
+    the rows are inserted together and their karma is awarded with one UPDATE.
+    Returns one result per item, in request order; items whose course does not exist are
+    reported as errors and the others are still created.
+    """
+    _check_bulk_size(len(requests))
+    existing_courses = _existing_course_ids({request.course_id for request in requests}, db)
+    
+    results = []
+    new_materials = []
+    for index, request in enumerate(requests):
+        if request.course_id not in existing_courses:
+            results.append({"index": index, "status": "error", "detail": f"Course with id {request.course_id} not found"})
+            continue
+        new_material = models.CourseMaterial(
+            course_id=request.course_id,
+            title=request.title,
+            type=request.type,
+            description=request.description,
+            role=request.role,
+            score=request.score,
+            file_link=request.file_link,
+            user_id=user_id
+        )
+        new_materials.append(new_material)
+        results.append({"index": index, "status": "created", "material": new_material})
+    
+    if not new_materials:
+        return _bulk_response(results)
+    
+    # SQLite cannot return the ids of a multi-row INSERT in order, so the flush inserts
+    # one row at a time; it is still a single transaction
+    db.add_all(new_materials)
+    db.flush()
+    user.add_karma_entries(user_id, [
+        {"points": MATERIAL_UPLOAD_KARMA, "reason": 'material_upload', "material_id": m.id, "course_id": m.course_id}
+        for m in new_materials
+    ], db)
+    # Serialize before the commit expires the objects, which would reload them one query each
+    for result in results:
+        if "material" in result:
+            result["material"] = schemas.ShowCourseMaterial.model_validate(result["material"])
+    per_course = Counter(m.course_id for m in new_materials)
+    table_version.bump([table_version.course_materials(course_id) for course_id in per_course], db)
+    db.commit()
+    
+    for course_id, count in per_course.items():
+        user.karma_committed(user_id, count * MATERIAL_UPLOAD_KARMA, course_id)
+    return _bulk_response(results, len(new_materials) * MATERIAL_UPLOAD_KARMA)
+
+def update_many(requests: List[schemas.CourseMaterialBulkUpdate], db: Session):
+    """
+    Update several materials in one transaction, loading them and checking their courses
+    with one IN query each. Returns one result per item, in request order.
+    """
+    _check_bulk_size(len(requests))
+    materials = {
+        m.id: m for m in db.query(models.CourseMaterial).filter(models.CourseMaterial.id.in_({request.id for request in requests})).all()
+    }
+    existing_courses = _existing_course_ids({request.course_id for request in requests}, db)
+    
+    results = []
+    changed_links = set()
+    changed_courses = set()
+    moved_courses = set()
+    for index, request in enumerate(requests):
+        material = materials.get(request.id)
+        if material is None:
+            results.append({"index": index, "status": "error", "detail": f"Material with id {request.id} not found"})
+            continue
+        if request.course_id not in existing_courses:
+            results.append({"index": index, "status": "error", "detail": f"Course with id {request.course_id} not found"})
+            continue
+        
+        changed_courses.update((material.course_id, request.course_id))
+        if material.course_id != request.course_id:
+            moved_courses.update((material.course_id, request.course_id))
+        material.course_id = request.course_id
+        material.title = request.title
+        material.type = request.type
+        material.description = request.description
+        material.role = request.role
+        material.score = request.score
+        if material.file_link != request.file_link:
+            changed_links.add(material.id)
+            material.content_type = None
+            material.file_size = None
+        material.file_link = request.file_link
+        results.append({"index": index, "status": "updated", "material": material})
+    
+    if changed_links:
+        material_text.delete_many(changed_links, db)
+    table_version.bump([table_version.course_materials(course_id) for course_id in changed_courses], db)
+    db.flush()
+    for result in results:
+        if "material" in result:
+            result["material"] = schemas.ShowCourseMaterial.model_validate(result["material"])
+    db.commit()
+    
+    for material_id in changed_links:
+        text_cache.invalidate(material_id)
+    leaderboard.invalidate_courses(moved_courses)
+    return _bulk_response(results)
+
 def destroy(id: int, db: Session):
     material = db.query(models.CourseMaterial).filter(models.CourseMaterial.id == id)
-    if not material.first():
+    existing = material.first()
+    if not existing:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Material with id {id} not found")
+    material_text.delete(id, db)
+    # The karma stays with the user but no longer counts for the course (and a reused id must not inherit it)
+    db.query(models.KarmaLedger).filter(models.KarmaLedger.material_id == id).update(
+        {models.KarmaLedger.material_id: None}, synchronize_session=False
+    )
+    course_id = existing.course_id
+    table_version.bump([table_version.course_materials(course_id)], db)
     material.delete(synchronize_session=False)
     db.commit()
+    text_cache.invalidate(id)
+    leaderboard.invalidate_courses([course_id])
     return {'done'}
 
 def update(id: int, request: schemas.CourseMaterial, db: Session):
@@ -68,25 +225,45 @@ def update(id: int, request: schemas.CourseMaterial, db: Session):
         if not course:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with id {request.course_id} not found")
     
+    table_version.bump([table_version.course_materials(material.course_id), table_version.course_materials(request.course_id)], db)
+    moved_from = material.course_id if material.course_id != request.course_id else None
     material.course_id = request.course_id
     material.title = request.title
     material.type = request.type
     material.description = request.description
     material.role = request.role
     material.score = request.score
+    link_changed = material.file_link != request.file_link
     material.file_link = request.file_link
+    if link_changed:
+        # Type and size of a linked (not uploaded) file are unknown until it is fetched
+        material.content_type = None
+        material.file_size = None
+        material_text.delete(id, db)
     db.commit()
     db.refresh(material)
+    if link_changed:
+        text_cache.invalidate(id)
+    if moved_from is not None:
+        leaderboard.invalidate_courses([moved_from, request.course_id])
     return material
 
-def update_file_link(id: int, file_link: str, db: Session):
-    """Update only the file_link of a material"""
+def update_file_link(id: int, file_link: str, db: Session, content_type: str = None, file_size: int = None):
+    """Update the file_link of a material, with the content type and size of the uploaded file"""
     material = db.query(models.CourseMaterial).filter(models.CourseMaterial.id == id).first()
     if not material:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Material with id {id} not found")
     
+    link_changed = material.file_link != file_link
     material.file_link = file_link
+    material.content_type = content_type
+    material.file_size = file_size
+    table_version.bump([table_version.course_materials(material.course_id)], db)
+    if link_changed:
+        material_text.delete(id, db)
     db.commit()
     db.refresh(material)
+    if link_changed:
+        text_cache.invalidate(id)
     return material
 
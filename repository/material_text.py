@@ -0,0 +1,45 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+import models
+
+def select_current(material_id: int, file_link: str):
+    """Statement for the precomputed text of a material, only if it matches the material's current file_link"""
+    return select(models.MaterialText).where(
+        models.MaterialText.material_id == material_id,
+        models.MaterialText.file_link == file_link
+    )
+
+def select_row(material_id: int):
+    """Statement for the stored text row of a material, whatever file it was extracted from"""
+    return select(models.MaterialText).where(models.MaterialText.material_id == material_id)
+
+def new_or_update(row: Optional[models.MaterialText], material_id: int, file_link: str, content: str, page_count: Optional[int]) -> models.MaterialText:
+    """Fill `row` (or a new row when None) with the extracted text; the caller adds and commits it"""
+    if not row:
+        row = models.MaterialText(material_id=material_id)
+    row.file_link = file_link
+    row.content = content
+    row.page_count = page_count
+    row.char_count = len(content)
+    return row
+
+def get(material_id: int, file_link: str, db: Session) -> Optional[models.MaterialText]:
+    """Get the precomputed text of a material, only if it matches the material's current file_link"""
+    return db.execute(select_current(material_id, file_link)).scalars().first()
+
+def save(material_id: int, file_link: str, content: str, page_count: Optional[int], db: Session):
+    """Insert or replace the extracted text of a material"""
+    row = new_or_update(db.execute(select_row(material_id)).scalars().first(), material_id, file_link, content, page_count)
+    db.add(row)
+    db.commit()
+    return row
+
+def delete(material_id: int, db: Session):
+    """Delete the extracted text of a material. The caller is responsible for committing."""
+    db.query(models.MaterialText).filter(models.MaterialText.material_id == material_id).delete(synchronize_session=False)
+
+def delete_many(material_ids: List[int], db: Session):
+    """Delete the extracted text of several materials. The caller is responsible for committing."""
+    db.query(models.MaterialText).filter(models.MaterialText.material_id.in_(material_ids)).delete(synchronize_session=False)
@@ -0,0 +1,33 @@
+"""
+Version counters for cached/conditional reads (see etags.py).
+Writers bump the counters of what they change in the same transaction as the change,
+so a version never moves ahead of, or behind, the data it describes.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import Iterable
+
+import models
+
+COURSES = 'courses'
+MATERIALS = 'course_materials'
+
+def course_materials(course_id: int) -> str:
+    """Key of the materials of one course"""
+    return f"{MATERIALS}:{course_id}"
+
+def get(key: str, db: Session) -> int:
+    """Current version of a key (0 if it was never bumped)"""
+    row = db.query(models.TableVersion.version).filter(models.TableVersion.key == key).first()
+    return row[0] if row else 0
+
+def bump(keys: Iterable[str], db: Session):
+    """Increment the version of each key. The caller is responsible for committing."""
+    for key in dict.fromkeys(keys):
+        db.execute(
+            text(
+                "INSERT INTO table_versions (key, version) VALUES (:key, 1) "
+                "ON CONFLICT(key) DO UPDATE SET version = version + 1"
+            ),
+            {"key": key}
+        )
@@ -1,18 +1,37 @@
 from fastapi import Depends, status, HTTPException
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
+from typing import List, Optional
 
 import schemas
 import database
 import models
-import hashing
+from user_cache import user_cache
+from leaderboard import leaderboard
 
-def create_user(request: schemas.User, db:Session):
-    new_user = models.User(name = request.name, email = request.email, password = hashing.Hash.bcrypt(request.password))
+def create_user(request: schemas.User, hashed_password: str, db:Session):
+    """Insert a user whose password was already hashed (hashing.Hash.bcrypt is awaited by the router)"""
+    new_user = models.User(name = request.name, email = request.email, password = hashed_password)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    user_cache.invalidate_subject(new_user.email)
+    leaderboard.record(new_user.id, 0)
     return new_user
 
+def select_for_token(user_id: Optional[int], email: str):
+    """
+    Statement for the user a token was issued to: primary key lookup when the token carries
+    the user id (the email must still match), email lookup for older tokens.
+    """
+    if user_id is not None:
+        return select(models.User).where(models.User.id == user_id, models.User.email == email)
+    return select(models.User).where(models.User.email == email).limit(1)
+
+def get_for_token(user_id: Optional[int], email: str, db: Session):
+    """The user a token was issued to, or None (see select_for_token)"""
+    return db.execute(select_for_token(user_id, email)).scalars().first()
+
 def get_user(id: int, db: Session):
     user = db.query(models.User).filter(models.User.id == id).first()
 
@@ -21,33 +40,34 @@ def get_user(id: int, db: Session):
     
     return user
 
-def add_karma(user_id: int, points: int, db: Session):
-    """Add karma points to a user"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+def add_karma(user_id: int, points: int, db: Session, reason: str = None, material_id: int = None, course_id: int = None, commit: bool = True):
+    """
+    Add karma points to a user with a single UPDATE (no read-modify-write) and record them in the karma ledger.
+    With commit=False the changes join the caller's transaction; the caller then commits
+    and calls karma_committed.
+    """
+    add_karma_entries(user_id, [{"points": points, "reason": reason, "material_id": material_id, "course_id": course_id}], db)
+    if commit:
+        db.commit()
+        karma_committed(user_id, points, course_id)
+
+def add_karma_entries(user_id: int, entries: List[dict], db: Session):
+    """
+    Award several ledger entries (dicts of points, reason, material_id, course_id) to a user
+    with one UPDATE for their total and one multi-row ledger INSERT.
+    Joins the caller's transaction; the caller commits and calls karma_committed.
+    """
+    total = sum(entry["points"] for entry in entries)
+    updated = db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.karma: func.coalesce(models.User.karma, 0) + total},
+        synchronize_session=False
+    )
+    if not updated:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id {user_id} not found")
     
-    # Get karma value, handling case where column might not exist
-    try:
-        current_karma = getattr(user, 'karma', None)
-        if current_karma is None:
-            current_karma = 0
-            user.karma = 0
-        
-        user.karma = current_karma + points
-        db.commit()
-        db.refresh(user)
-        return user
-    except Exception as e:
-        # If karma column doesn't exist, rollback and log error
-        db.rollback()
-        print(f"Error updating karma (column might not exist): {e}")
-        # Re-run migrations and try again
-        from migrations import add_karma_column_if_not_exists
-        add_karma_column_if_not_exists()
-        # Retry
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        user.karma = (getattr(user, 'karma', 0) or 0) + points
-        db.commit()
-        db.refresh(user)
-        return user
\ No newline at end of file
+    db.execute(insert(models.KarmaLedger), [{**entry, "user_id": user_id} for entry in entries])
+
+def karma_committed(user_id: int, points: int, course_id: int = None):
+    """Update in-memory state after karma was committed: cached user and leaderboard rankings"""
+    user_cache.invalidate_user(user_id)
+    leaderboard.record(user_id, points, course_id)
@@ -0,0 +1,196 @@
+"""
+Chunked retrieval over course material text.
+Material text is split into overlapping chunks and indexed per course with BM25
+(vectorized with NumPy), so a chat prompt only carries the chunks relevant to the
+question instead of whole documents.
+"""
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1500"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP_CHARS", "200"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+# Number of course indexes kept in memory
+MAX_INDEXED_COURSES = int(os.getenv("RETRIEVAL_MAX_COURSES", "64"))
+# Characters of chunk text kept across all course indexes (least recently used courses are dropped first)
+MAX_INDEXED_CHARS = int(os.getenv("RETRIEVAL_MAX_CHARS", str(50 * 1024 * 1024)))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class Chunk:
+    material_id: int
+    position: int  # Index of the chunk within its material
+    text: str
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP_CHARS) -> List[str]:
+    """
+    Split text into chunks of about `size` characters, preferring paragraph boundaries.
+    Paragraphs longer than a chunk are cut into windows that overlap by `overlap` characters.
+    """
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(current) + len(paragraph) + 2 <= size:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+            continue
+        if current:
+            chunks.append(current)
+            current = ""
+        if len(paragraph) <= size:
+            current = paragraph
+            continue
+        step = max(1, size - overlap)
+        for start in range(0, len(paragraph), step):
+            window = paragraph[start:start + size]
+            if start > 0 and start + overlap >= len(paragraph):
+                break  # Only overlap left, already covered by the previous window
+            chunks.append(window)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class CourseIndex:
+    """BM25 index over the chunks of the materials of one course."""
+
+    def __init__(self, material_chunks: Dict[int, Tuple[str, List[str]]]):
+        # material_id -> (file_link, chunks)
+        self.material_chunks = material_chunks
+        self.chunks: List[Chunk] = [
+            Chunk(material_id, position, text)
+            for material_id, (_, texts) in material_chunks.items()
+            for position, text in enumerate(texts)
+        ]
+        self.chunk_material = np.array([chunk.material_id for chunk in self.chunks], dtype=np.int64)
+        self.char_count = sum(len(chunk.text) for chunk in self.chunks)
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.zeros(len(self.chunks), dtype=np.float32)
+        for chunk_index, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize(chunk.text))
+            lengths[chunk_index] = sum(counts.values())
+            for term, count in counts.items():
+                indexes, frequencies = postings.setdefault(term, ([], []))
+                indexes.append(chunk_index)
+                frequencies.append(count)
+
+        n_chunks = max(1, len(self.chunks))
+        average_length = float(lengths.mean()) if len(self.chunks) else 1.0
+        # Part of the BM25 denominator that only depends on the chunk
+        self._length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average_length, 1.0))
+        self._postings = {
+            term: (
+                np.array(indexes, dtype=np.int64),
+                np.array(frequencies, dtype=np.float32),
+                math.log(1 + (n_chunks - len(indexes) + 0.5) / (len(indexes) + 0.5)),
+            )
+            for term, (indexes, frequencies) in postings.items()
+        }
+
+    def matches(self, documents: Dict[int, Tuple[str, str]]) -> bool:
+        """True if the index holds exactly the (material_id, file_link) pairs of `documents`."""
+        return len(documents) == len(self.material_chunks) and all(
+            material_id in self.material_chunks and self.material_chunks[material_id][0] == file_link
+            for material_id, (file_link, _) in documents.items()
+        )
+
+    def search(self, query: str, material_ids: List[int], top_k: int = RETRIEVAL_TOP_K) -> List[Chunk]:
+        """Return the top_k chunks of the given materials for the query, best first."""
+        if not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            indexes, frequencies, idf = posting
+            # Each chunk appears once per posting list, so plain fancy-index accumulation is safe
+            scores[indexes] += idf * frequencies * (BM25_K1 + 1) / (frequencies + self._length_norm[indexes])
+
+        allowed = np.isin(self.chunk_material, np.array(material_ids, dtype=np.int64))
+        scores[~allowed] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) == 0:
+            # Nothing matches lexically (e.g. "summarize this"): use the opening chunks of each material
+            return self._leading_chunks(material_ids, top_k)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [self.chunks[i] for i in ranked]
+
+    def _leading_chunks(self, material_ids: List[int], top_k: int) -> List[Chunk]:
+        """Round-robin over the selected materials, taking chunks from the start of each."""
+        per_material = [
+            [chunk for chunk in self.chunks if chunk.material_id == material_id]
+            for material_id in dict.fromkeys(material_ids)
+        ]
+        selected = []
+        position = 0
+        while len(selected) < top_k and any(position < len(chunks) for chunks in per_material):
+            for chunks in per_material:
+                if position < len(chunks) and len(selected) < top_k:
+                    selected.append(chunks[position])
+            position += 1
+        return selected
+
+
+_indexes: "OrderedDict[int, CourseIndex]" = OrderedDict()
+_indexed_chars = 0
+_lock = threading.Lock()
+
+
+def get_course_index(course_id: int, documents: Dict[int, Tuple[str, str]]) -> CourseIndex:
+    """
+    Return the index of a course built over exactly `documents` (material_id -> (file_link, text)).
+    When the requested materials or their file versions differ from the cached index, it is
+    rebuilt, reusing the chunks of unchanged materials; deleted or replaced materials are dropped.
+    """
+    global _indexed_chars
+    with _lock:
+        index = _indexes.get(course_id)
+        if index is not None and index.matches(documents):
+            _indexes.move_to_end(course_id)
+            return index
+        previous = dict(index.material_chunks) if index is not None else {}
+
+    # Build outside the lock; a concurrent rebuild of the same course just wins or loses the race
+    material_chunks = {}
+    for material_id, (file_link, text) in documents.items():
+        if material_id in previous and previous[material_id][0] == file_link:
+            material_chunks[material_id] = previous[material_id]
+        else:
+            material_chunks[material_id] = (file_link, chunk_text(text))
+    index = CourseIndex(material_chunks)
+
+    with _lock:
+        replaced = _indexes.pop(course_id, None)
+        if replaced is not None:
+            _indexed_chars -= replaced.char_count
+        _indexes[course_id] = index
+        _indexed_chars += index.char_count
+        # Keep the index just built even if it alone is over the character limit
+        while len(_indexes) > 1 and (len(_indexes) > MAX_INDEXED_COURSES or _indexed_chars > MAX_INDEXED_CHARS):
+            _, evicted = _indexes.popitem(last=False)
+            _indexed_chars -= evicted.char_count
+    return index
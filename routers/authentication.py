@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 import traceback
@@ -8,20 +9,27 @@ import schemas
 import database
 import models
 import hashing
+import oauth2
 import jwt_token as token
+from user_cache import CurrentUser
 
 router = APIRouter(
     tags=['Authentication']
 )
 
+def _get_user_by_email(email: str, db: Session):
+    return db.query(models.User).filter(models.User.email == email).first()
+
 @router.post('/login')
-def login(request: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+async def login(request: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
     """
-    Login endpoint - authenticates user and returns access token
+    Login endpoint - authenticates user and returns access token.
+    Async so that waiting for bcrypt on the hashing pool does not hold a request thread;
+    the database calls run on the threadpool.
     """
     try:
         # Query user by email
-        user = db.query(models.User).filter(models.User.email == request.username).first()
+        user = await run_in_threadpool(_get_user_by_email, request.username, db)
         
         if not user:
             raise HTTPException(
@@ -30,15 +38,25 @@ def login(request: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(
             )
         
         # Verify password
-        if not hashing.Hash.verify(request.password, user.password):
+        if not await hashing.Hash.verify(request.password, user.password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, 
                 detail="Invalid email or password"
             )
         
+        # Transparently upgrade hashes made with an outdated bcrypt cost
+        if hashing.Hash.needs_rehash(user.password):
+            try:
+                user.password = await hashing.Hash.bcrypt(request.password)
+                await run_in_threadpool(db.commit)
+            except Exception as e:
+                # The login itself succeeded; try again next time
+                await run_in_threadpool(db.rollback)
+                print(f"Could not rehash password for user {user.id}: {e}")
+        
         # Create access token
         access_token = token.create_access_token(
-            data={"sub": user.email}
+            data={"sub": user.email, "uid": user.id, "name": user.name}
         )
         
         return {"access_token": access_token, "token_type": "bearer"}
@@ -53,4 +71,9 @@ def login(request: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Login failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get('/metrics/hashing')
+def hashing_metrics(current_user: CurrentUser = Depends(oauth2.get_current_user)):
+    """Queue depth, throughput and latency of the password hashing pool"""
+    return hashing.hash_pool.metrics()
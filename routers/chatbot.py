@@ -3,21 +3,25 @@ Chatbot router for Gemini AI integration
 Handles chat requests with course materials as context
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 import os
-import io
-import requests
-from docx import Document
-from pypdf import PdfReader
+import json
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
 from dotenv import load_dotenv
 
 import database
 import oauth2
 import models
-from repository import material
+import gemini_files
+import retrieval
+from repository import course, material, material_text, async_course, async_material
+from text_cache import text_cache
+from text_extraction import extract_text_from_url
 
 load_dotenv()
 
@@ -26,6 +30,20 @@ router = APIRouter(
     prefix="/chatbot"
 )
 
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+# How material text reaches the model:
+#   'retrieval' - only the chunks most relevant to the question are put in the prompt (retrieval.py)
+#   'files'     - whole documents are uploaded to the Gemini Files API
+CHAT_CONTEXT_MODE = os.getenv("CHAT_CONTEXT_MODE", "retrieval")
+
+# Maximum number of materials fetched/extracted/uploaded in parallel per chat request
+CHAT_MATERIAL_CONCURRENCY = int(os.getenv("CHAT_MATERIAL_CONCURRENCY", "4"))
+
+# Chat endpoints use an AsyncSession (and async authentication) when the async engine is enabled (see database.py)
+get_chat_db = database.get_async_db if database.DB_ASYNC_ENABLED else database.get_db
+get_chat_user = oauth2.get_current_user_async if database.DB_ASYNC_ENABLED else oauth2.get_current_user
+
 # Initialize Gemini client
 try:
     gemini_client = genai.Client()
@@ -45,249 +63,288 @@ class ChatResponse(BaseModel):
     materials_used: List[int]
 
 
-def extract_text_from_docx_url(url: str) -> Optional[str]:
-    """Downloads DOCX content and extracts text using python-docx."""
-    try:
-        print(f"Attempting to download DOCX from: {url}")
-        response = requests.get(url, timeout=30, stream=True)
-        response.raise_for_status()
-        
-        print(f"Downloaded {len(response.content)} bytes")
-        docx_file = io.BytesIO(response.content)
-        doc = Document(docx_file)
-        full_text = []
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():  # Only add non-empty paragraphs
-                full_text.append(paragraph.text)
-        
-        extracted = '\n'.join(full_text)
-        print(f"Extracted {len(extracted)} characters from DOCX")
-        return extracted
-    except requests.exceptions.RequestException as e:
-        print(f"Error downloading file from {url}: {e}")
-        print(f"Response status: {getattr(e.response, 'status_code', 'N/A')}")
-        return None
-    except Exception as e:
-        print(f"Error extracting text from DOCX {url}: {e}")
-        import traceback
-        traceback.print_exc()
+def _cached_material_text(material_obj: models.CourseMaterial) -> Optional[str]:
+    cached = text_cache.get(material_obj.id, material_obj.file_link)
+    if cached is not None:
+        print(f"Using cached text for material {material_obj.id}")
+    return cached
+
+
+def _stored_material_text(material_obj: models.CourseMaterial, stored: Optional[models.MaterialText]) -> Optional[str]:
+    if stored is None:
         return None
+    print(f"Using precomputed text for material {material_obj.id}")
+    text_cache.put(material_obj.id, material_obj.file_link, stored.content)
+    return stored.content
+
+
+def get_stored_material_text(material_obj: models.CourseMaterial, db: Session) -> Optional[str]:
+    """
+    Return the already extracted text of a material's file, if any.
+    Looks in the in-process cache, then in the text precomputed at upload time.
+    """
+    cached = _cached_material_text(material_obj)
+    if cached is not None:
+        return cached
+    return _stored_material_text(material_obj, material_text.get(material_obj.id, material_obj.file_link, db))
+
+
+async def get_stored_material_text_async(material_obj: models.CourseMaterial, db) -> Optional[str]:
+    """get_stored_material_text on an AsyncSession"""
+    cached = _cached_material_text(material_obj)
+    if cached is not None:
+        return cached
+    return _stored_material_text(material_obj, await async_material.get_text(material_obj.id, material_obj.file_link, db))
 
 
-def extract_text_from_txt_url(url: str) -> Optional[str]:
-    """Downloads plain text file."""
+def prepare_material(material_obj: models.CourseMaterial, stored_text: Optional[str], upload: bool) -> dict:
+    """
+    Fetch/extract the text of one material (unless already known) and, when `upload` is set,
+    make it available in the Gemini Files API.
+    Runs on a worker thread, so it must not touch the request's DB session.
+    
+    Returns a dict with the prompt entry (or None), the Gemini file (or None) and
+    the text extracted live (or None) so the caller can persist it.
+    """
+    result = {'entry': None, 'uploaded_file': None, 'extracted': None}
+    material_id = material_obj.id
+    
+    print(f"Processing material {material_id}: {material_obj.title}")
+    print(f"File link: {material_obj.file_link}")
+    
+    extracted_text = stored_text
+    if extracted_text is None:
+        # Legacy row without precomputed text: download and parse now
+        extracted_text = extract_text_from_url(material_obj.file_link, material_obj.content_type)
+        if extracted_text and extracted_text.strip():
+            text_cache.put(material_id, material_obj.file_link, extracted_text)
+            result['extracted'] = extracted_text
+    
+    if not extracted_text or not extracted_text.strip():
+        print(f"⚠️ Could not extract text from file: {material_obj.file_link}")
+        return result
+    
+    if not upload:
+        # Chunks are picked later, once the texts of all selected materials are known
+        result['entry'] = {
+            'type': 'document',
+            'text': extracted_text,
+            'title': material_obj.title,
+            'description': material_obj.description,
+            'file_link': material_obj.file_link,
+            'material_id': material_id
+        }
+        return result
+    
+    # Use Gemini Files API for better handling of large files
     try:
-        print(f"Attempting to download TXT from: {url}")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        # Try to decode as UTF-8, fallback to latin-1
-        try:
-            text = response.content.decode('utf-8')
-        except UnicodeDecodeError:
-            text = response.content.decode('latin-1')
+        # Reuse a live upload of the same text, uploading only when there is none
+        uploaded_file = gemini_files.registry.get_or_upload(
+            gemini_client,
+            material_id,
+            f"{material_obj.title}_{material_id}.txt",
+            extracted_text
+        )
+        result['uploaded_file'] = uploaded_file
         
-        print(f"Extracted {len(text)} characters from TXT")
-        return text
+        # Store reference for use in prompt
+        result['entry'] = {
+            'type': 'file',
+            'file': uploaded_file,
+            'title': material_obj.title,
+            'material_id': material_id
+        }
+        print(f"✅ Material {material_id} available in Gemini Files API as {uploaded_file.name}")
     except Exception as e:
-        print(f"Error extracting text from TXT {url}: {e}")
-        return None
+        print(f"Error uploading to Gemini Files API, falling back to text: {e}")
+        # Fallback: use text directly
+        result['entry'] = {
+            'type': 'text',
+            'content': f"Material: {material_obj.title}\n{extracted_text[:5000]}",  # Limit to avoid token limits
+            'material_id': material_id
+        }
+    return result
 
 
-def extract_text_from_pdf_url(url: str) -> Optional[str]:
-    """Downloads PDF content and extracts text using pypdf."""
-    try:
-        print(f"Attempting to download PDF from: {url}")
-        response = requests.get(url, timeout=30, stream=True)
-        response.raise_for_status()
-        
-        print(f"Downloaded {len(response.content)} bytes")
-        pdf_file = io.BytesIO(response.content)
-        
-        # Use PdfReader to extract text from PDF
-        pdf_reader = PdfReader(pdf_file)
-        
-        full_text = []
-        total_pages = len(pdf_reader.pages)
-        print(f"PDF has {total_pages} pages")
-        
-        for page_num, page in enumerate(pdf_reader.pages, start=1):
-            try:
-                page_text = page.extract_text()
-                if page_text.strip():  # Only add non-empty pages
-                    full_text.append(page_text)
-                    print(f"Extracted text from page {page_num}/{total_pages}")
-            except Exception as e:
-                print(f"Warning: Could not extract text from page {page_num}: {e}")
-                continue
-        
-        extracted = '\n\n'.join(full_text)
-        print(f"Extracted {len(extracted)} characters from PDF ({total_pages} pages)")
-        
-        if not extracted.strip():
-            print("⚠️ PDF appears to be empty or contains only images/scanned content")
-            return None
-        
-        return extracted
+def select_relevant_chunks(request: ChatRequest, materials_text: List[dict]) -> tuple[List[dict], List[int]]:
+    """
+    Replace whole-document entries with the chunks of the course index that best match the question.
+    Materials none of whose chunks are selected fall back to their metadata (title and description).
+    Returns the new (materials_text, materials_used).
+    """
+    documents = {}
+    for mat in materials_text:
+        if mat['type'] == 'document':
+            documents[mat['material_id']] = (mat['file_link'], mat['text'])
+    
+    index = retrieval.get_course_index(request.course_id, documents)
+    selected = index.search(request.message, list(documents))
+    print(f"Selected {len(selected)} chunks from {len(documents)} materials for the prompt")
+    
+    chunks_by_material = {}
+    for chunk in sorted(selected, key=lambda c: (c.material_id, c.position)):
+        chunks_by_material.setdefault(chunk.material_id, []).append(chunk.text)
+    
+    entries = []
+    emitted = set()
+    for mat in materials_text:
+        if mat['type'] != 'document':
+            entries.append(mat)
+            continue
+        material_id = mat['material_id']
+        if material_id in emitted:
+            continue
+        emitted.add(material_id)
+        if material_id not in chunks_by_material:
+            if mat['description']:
+                entries.append({
+                    'type': 'text',
+                    'content': f"Material: {mat['title']}\nDescription: {mat['description']}",
+                    'material_id': material_id
+                })
+            continue
+        excerpts = "\n...\n".join(chunks_by_material[material_id])
+        entries.append({
+            'type': 'text',
+            'content': f"Material: {mat['title']} (relevant excerpts)\n{excerpts}",
+            'material_id': material_id
+        })
+    
+    materials_used = list(dict.fromkeys(mat['material_id'] for mat in entries))
+    return entries, materials_used
+
+
+def _check_course(course_obj: Optional[models.Course], course_id: int):
+    if not course_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Course with id {course_id} not found"
+        )
+
+
+def _materials_in_course(request: ChatRequest, materials: dict) -> list:
+    """The requested materials (loaded by id in `materials`) that belong to the course, in request order"""
+    in_course = []
+    for material_id in request.material_ids:
+        material_obj = materials.get(material_id)
+        if material_obj is None:
+            print(f"Material {material_id} not found")
+            continue
         
-    except requests.exceptions.RequestException as e:
-        print(f"Error downloading PDF file from {url}: {e}")
-        print(f"Response status: {getattr(e.response, 'status_code', 'N/A')}")
-        return None
-    except Exception as e:
-        print(f"Error extracting text from PDF {url}: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+        # Verify material belongs to the course
+        if material_obj.course_id != request.course_id:
+            print(f"Material {material_id} does not belong to course {request.course_id}")
+            continue
+        in_course.append(material_obj)
+    return in_course
 
 
-def extract_text_from_url(url: str) -> Optional[str]:
+def load_selected_materials(db: Session, request: ChatRequest) -> list:
     """
-    Extract text from various file types.
-    Supports: DOCX, TXT, PDF
+    Verify the course and load the requested materials with any already extracted text.
+    Returns [(material_id, material_obj, stored_text)] in request order.
     """
-    if not url or not url.strip():
-        return None
+    _check_course(course.get(request.course_id, db), request.course_id)
     
-    # Normalize URL - remove query parameters for extension check
-    url_lower = url.lower().split('?')[0]
+    selected = []
+    for material_obj in _materials_in_course(request, material.get_many(request.material_ids, db)):
+        stored_text = get_stored_material_text(material_obj, db) if material_obj.file_link else None
+        selected.append((material_obj.id, material_obj, stored_text))
+    return selected
+
+
+async def load_selected_materials_async(db, request: ChatRequest) -> list:
+    """load_selected_materials on an AsyncSession"""
+    _check_course(await async_course.get(request.course_id, db), request.course_id)
     
-    # Try to detect file type from URL extension
-    if url_lower.endswith('.docx'):
-        return extract_text_from_docx_url(url)
-    elif url_lower.endswith('.txt') or url_lower.endswith('.text'):
-        return extract_text_from_txt_url(url)
-    elif url_lower.endswith('.pdf'):
-        return extract_text_from_pdf_url(url)
-    else:
-        # Try to detect from Content-Type header
+    selected = []
+    for material_obj in _materials_in_course(request, await async_material.get_many(request.material_ids, db)):
+        stored_text = await get_stored_material_text_async(material_obj, db) if material_obj.file_link else None
+        selected.append((material_obj.id, material_obj, stored_text))
+    return selected
+
+
+def prepare_selected_materials(selected: list) -> list:
+    """
+    Fetch, extract (and upload) the files concurrently; map() keeps the request order.
+    Returns one prepare_material result, None (no file) or the raised exception per material.
+    """
+    def run(item):
+        material_id, material_obj, stored_text = item
+        if not material_obj.file_link:
+            return None
         try:
-            print(f"Attempting to detect file type for: {url}")
-            head_response = requests.head(url, timeout=10, allow_redirects=True)
-            content_type = head_response.headers.get('Content-Type', '').lower()
-            
-            if 'wordprocessingml' in content_type or 'msword' in content_type or url_lower.endswith('.docx'):
-                return extract_text_from_docx_url(url)
-            elif 'text/plain' in content_type or url_lower.endswith('.txt'):
-                return extract_text_from_txt_url(url)
-            elif 'application/pdf' in content_type or 'pdf' in content_type or url_lower.endswith('.pdf'):
-                return extract_text_from_pdf_url(url)
-            else:
-                print(f"Unsupported content type: {content_type} for URL: {url}")
-                return None
+            return prepare_material(material_obj, stored_text, upload=CHAT_CONTEXT_MODE == 'files')
         except Exception as e:
-            print(f"Error detecting file type for {url}: {e}")
-            # Fallback: try PDF first, then DOCX
-            if url_lower.endswith('.pdf'):
-                return extract_text_from_pdf_url(url)
-            else:
-                return extract_text_from_docx_url(url)
+            return e
+    
+    workers = max(1, min(CHAT_MATERIAL_CONCURRENCY, len(selected)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-material") as executor:
+        return list(executor.map(run, selected))
 
 
-@router.post('/chat', response_model=ChatResponse)
-def chat_with_materials(
-    request: ChatRequest,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
-):
+def persist_extracted_texts(db: Session, selected: list, prepared: list):
+    """Store text extracted live for legacy materials, so the next request finds it precomputed."""
+    for (material_id, material_obj, _), result in zip(selected, prepared):
+        if isinstance(result, dict) and result['extracted'] is not None:
+            try:
+                material_text.save(material_id, material_obj.file_link, result['extracted'], None, db)
+            except Exception as e:
+                # Persisting is only an optimization for the next request
+                db.rollback()
+                print(f"Error storing extracted text for material {material_id}: {e}")
+
+
+async def persist_extracted_texts_async(db, selected: list, prepared: list):
+    """persist_extracted_texts on an AsyncSession"""
+    for (material_id, material_obj, _), result in zip(selected, prepared):
+        if isinstance(result, dict) and result['extracted'] is not None:
+            try:
+                await async_material.save_text(material_id, material_obj.file_link, result['extracted'], None, db)
+            except Exception as e:
+                # Persisting is only an optimization for the next request
+                await db.rollback()
+                print(f"Error storing extracted text for material {material_id}: {e}")
+
+
+def assemble_chat_contents(request: ChatRequest, selected: list, prepared: list) -> tuple[list, List[int]]:
     """
-    Chat with Gemini AI using selected course materials as context.
-    
-    - **course_id**: ID of the course
-    - **material_ids**: List of material IDs to include in context
-    - **message**: User's message/question
+    Build the Gemini prompt parts from the prepared materials.
+    Returns (contents, materials_used).
     """
-    if not gemini_client:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Gemini AI service is not available"
-        )
-    
-    # Verify course exists
-    course = db.query(models.Course).filter(models.Course.id == request.course_id).first()
-    if not course:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Course with id {request.course_id} not found"
-        )
-    
     # Get materials
     materials_text = []
     materials_used = []
-    uploaded_files = []  # Track files uploaded to Gemini for cleanup
+    uploaded_files = []  # Gemini files referenced by this prompt (owned by gemini_files.registry)
     
-    for material_id in request.material_ids:
-        try:
-            material_obj = material.show(material_id, None, db)
-            
-            # Verify material belongs to the course
-            if material_obj.course_id != request.course_id:
-                print(f"Material {material_id} does not belong to course {request.course_id}")
-                continue
-            
-            # Extract text from file if available
-            if material_obj.file_link:
-                print(f"Processing material {material_id}: {material_obj.title}")
-                print(f"File link: {material_obj.file_link}")
-                
-                # Extract text from file
-                extracted_text = extract_text_from_url(material_obj.file_link)
-                
-                if extracted_text and extracted_text.strip():
-                    # Use Gemini Files API for better handling of large files
-                    try:
-                        # Upload extracted text to Gemini Files API
-                        text_bytes = extracted_text.encode('utf-8')
-                        text_io = io.BytesIO(text_bytes)
-                        
-                        uploaded_file = gemini_client.files.upload(
-                            file=text_io,
-                            config={
-                                'mime_type': 'text/plain',
-                                'display_name': f"{material_obj.title}_{material_id}.txt"
-                            }
-                        )
-                        uploaded_files.append(uploaded_file)
-                        
-                        # Store reference for use in prompt
-                        materials_text.append({
-                            'type': 'file',
-                            'file': uploaded_file,
-                            'title': material_obj.title,
-                            'material_id': material_id
-                        })
-                        materials_used.append(material_id)
-                        print(f"✅ Successfully uploaded material {material_id} to Gemini Files API")
-                    except Exception as e:
-                        print(f"Error uploading to Gemini Files API, falling back to text: {e}")
-                        # Fallback: use text directly
-                        materials_text.append({
-                            'type': 'text',
-                            'content': f"Material: {material_obj.title}\n{extracted_text[:5000]}",  # Limit to avoid token limits
-                            'material_id': material_id
-                        })
-                        materials_used.append(material_id)
-                else:
-                    print(f"⚠️ Could not extract text from file: {material_obj.file_link}")
-            
-            # Always include material metadata (title and description)
-            if material_obj.description:
-                metadata = f"Material: {material_obj.title}\nDescription: {material_obj.description}"
-                # Check if we already have this material in our list
-                material_exists = any(m.get('material_id') == material_id for m in materials_text if isinstance(m, dict))
-                if not material_exists:
-                    materials_text.append({
-                        'type': 'text',
-                        'content': metadata,
-                        'material_id': material_id
-                    })
-                    if material_id not in materials_used:
-                        materials_used.append(material_id)
-        except Exception as e:
-            print(f"Error processing material {material_id}: {e}")
-            import traceback
-            traceback.print_exc()
+    for (material_id, material_obj, _), result in zip(selected, prepared):
+        if isinstance(result, Exception):
+            print(f"Error processing material {material_id}: {result}")
             continue
+        
+        if result is not None:
+            if result['uploaded_file'] is not None:
+                uploaded_files.append(result['uploaded_file'])
+            if result['entry'] is not None:
+                materials_text.append(result['entry'])
+                materials_used.append(material_id)
+        
+        # Always include material metadata (title and description)
+        if material_obj.description:
+            metadata = f"Material: {material_obj.title}\nDescription: {material_obj.description}"
+            # Check if we already have this material in our list
+            material_exists = any(m.get('material_id') == material_id for m in materials_text if isinstance(m, dict))
+            if not material_exists:
+                materials_text.append({
+                    'type': 'text',
+                    'content': metadata,
+                    'material_id': material_id
+                })
+                if material_id not in materials_used:
+                    materials_used.append(material_id)
+    
+    if any(mat['type'] == 'document' for mat in materials_text):
+        materials_text, materials_used = select_relevant_chunks(request, materials_text)
     
     if not materials_text:
         raise HTTPException(
@@ -295,30 +352,81 @@ def chat_with_materials(
             detail="No valid materials with extractable content found. Make sure materials have file links and files are accessible."
         )
     
+    # Prepare contents for Gemini API
+    # Mix of uploaded files and text content
+    contents = []
+    
+    # Add uploaded files (from Gemini Files API) and text metadata
+    for mat in materials_text:
+        if mat['type'] == 'file':
+            # File uploaded to Gemini Files API
+            contents.append(mat['file'])
+            # Add a text part describing the file
+            contents.append(f"Material: {mat['title']}\n")
+        elif mat['type'] == 'text':
+            # Regular text content
+            contents.append(mat['content'])
+    
+    # Add the user's question
+    contents.append(f"\n\nUser Question: {request.message}\n\nPlease provide a helpful answer based on the course materials provided above.")
+    
+    print(f"Sending {len(contents)} content parts to Gemini (including {len(uploaded_files)} files)")
+    return contents, materials_used
+
+
+def build_chat_contents(request: ChatRequest, db: Session) -> tuple[list, List[int]]:
+    """
+    Validate a chat request and build the Gemini prompt parts from the selected materials.
+    Returns (contents, materials_used).
+    """
+    selected = load_selected_materials(db, request)
+    prepared = prepare_selected_materials(selected)
+    persist_extracted_texts(db, selected, prepared)
+    return assemble_chat_contents(request, selected, prepared)
+
+
+async def build_chat_contents_async(request: ChatRequest, db) -> tuple[list, List[int]]:
+    """
+    Same as build_chat_contents on an AsyncSession: DB work is awaited on the async driver,
+    file fetching/extraction and prompt assembly run on worker threads.
+    """
+    selected = await load_selected_materials_async(db, request)
+    prepared = await run_in_threadpool(prepare_selected_materials, selected)
+    await persist_extracted_texts_async(db, selected, prepared)
+    return await run_in_threadpool(assemble_chat_contents, request, selected, prepared)
+
+
+async def get_chat_contents(request: ChatRequest, db) -> tuple[list, List[int]]:
+    if not gemini_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Gemini AI service is not available"
+        )
+    if database.DB_ASYNC_ENABLED:
+        return await build_chat_contents_async(request, db)
+    return await run_in_threadpool(build_chat_contents, request, db)
+
+
+@router.post('/chat', response_model=ChatResponse)
+async def chat_with_materials(
+    request: ChatRequest,
+    db: Session = Depends(get_chat_db),
+    current_user: models.User = Depends(get_chat_user)
+):
+    """
+    Chat with Gemini AI using selected course materials as context.
+    
+    - **course_id**: ID of the course
+    - **material_ids**: List of material IDs to include in context
+    - **message**: User's message/question
+    """
+    contents, materials_used = await get_chat_contents(request, db)
+    
     try:
-        # Prepare contents for Gemini API
-        # Mix of uploaded files and text content
-        contents = []
-        
-        # Add uploaded files (from Gemini Files API) and text metadata
-        for mat in materials_text:
-            if mat['type'] == 'file':
-                # File uploaded to Gemini Files API
-                contents.append(mat['file'])
-                # Add a text part describing the file
-                contents.append(f"Material: {mat['title']}\n")
-            elif mat['type'] == 'text':
-                # Regular text content
-                contents.append(mat['content'])
-        
-        # Add the user's question
-        contents.append(f"\n\nUser Question: {request.message}\n\nPlease provide a helpful answer based on the course materials provided above.")
-        
-        print(f"Sending {len(contents)} content parts to Gemini (including {len(uploaded_files)} files)")
-        
         # Generate response using Gemini
-        response = gemini_client.models.generate_content(
-            model='gemini-2.5-flash',
+        response = await run_in_threadpool(
+            gemini_client.models.generate_content,
+            model=GEMINI_MODEL,
             contents=contents
         )
         
@@ -337,13 +445,50 @@ def chat_with_materials(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error communicating with Gemini AI: {str(e)}"
         )
-    
-    finally:
-        # Cleanup: Delete uploaded files from Gemini Files API
-        for uploaded_file in uploaded_files:
-            try:
-                print(f"Cleaning up uploaded file: {uploaded_file.name}")
-                gemini_client.files.delete(name=uploaded_file.name)
-            except Exception as e:
-                print(f"Error deleting file {uploaded_file.name}: {e}")
 
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post('/chat/stream')
+async def chat_with_materials_stream(
+    request: ChatRequest,
+    db: Session = Depends(get_chat_db),
+    current_user: models.User = Depends(get_chat_user)
+):
+    """
+    Streaming variant of /chat using server-sent events.
+    
+    Emits `token` events (`{"text": ...}`) as Gemini produces the answer, then a final
+    `done` event carrying `{"materials_used": [...]}`. Failures after streaming has started
+    are reported as an `error` event (`{"detail": ...}`) since the status code is already sent.
+    Validation errors (unknown course, no usable materials) are returned as regular HTTP errors.
+    """
+    # All DB work and material preparation happens before the first byte is sent
+    contents, materials_used = await get_chat_contents(request, db)
+    
+    def event_stream():
+        try:
+            for chunk in gemini_client.models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=contents
+            ):
+                if chunk.text:
+                    yield sse_event('token', {'text': chunk.text})
+            yield sse_event('done', {'materials_used': materials_used})
+        except Exception as e:
+            print(f"Error communicating with Gemini AI: {e}")
+            import traceback
+            traceback.print_exc()
+            yield sse_event('error', {'detail': f"Error communicating with Gemini AI: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx)
+        }
+    )
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, status, Response, Query
+from fastapi import APIRouter, Depends, status, Request, Response, Query, UploadFile, File, HTTPException
 from typing import List, Optional
 from sqlalchemy.orm import Session
+import io
 
 import schemas
 import database
 import oauth2
-from repository import course
+import pagination
+import course_import
+import etags
+import fast_json
+from course_cache import course_cache
+from repository import course, table_version
 
 router = APIRouter(
     tags=['Courses'],
@@ -18,26 +24,58 @@ router = APIRouter(
 def create(request:schemas.Course, db:Session = Depends(database.get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
     return course.create(request, db)
 
+@router.post('/bulk', response_model=schemas.CourseImportReport)
+def bulk_import(
+    file: UploadFile = File(...),
+    db: Session = Depends(database.get_db),
+    current_user: schemas.User = Depends(oauth2.get_current_admin)
+):
+    """
+    Import courses from a CSV upload (columns course_code, title, instructors and optionally Credits).
+    Existing courses are updated by course_code, so the same file can be uploaded again safely.
+    """
+    # utf-8-sig: spreadsheet exports often start with a byte order mark
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        report = course_import.import_courses(lines, db, progress=course_import.print_progress)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid CSV: {e}")
+    finally:
+        lines.detach()
+    return report.as_dict()
+
 #GET
 @router.get('/', response_model=List[schemas.ShowCourse])
 def get_courses(
+    request: Request,
+    response: Response,
     search: Optional[str] = Query(None, description="Search courses by code, title, or instructors"),
+    page: pagination.Page = Depends(pagination.page_params),
     db: Session = Depends(database.get_db), 
     current_user: schemas.User = Depends(oauth2.get_current_user)
 ):
     """
-    Get all courses or search courses.
+    Get courses or search courses.
+    
+    - If 'search' query parameter is provided: returns courses matching the search term (ranked, not paginated)
+    - If no 'search' parameter: returns one page of courses ordered by id; pass the
+      X-Next-Cursor response header back as 'cursor' to get the next page
     
-    - If 'search' query parameter is provided: returns courses matching the search term
-    - If no 'search' parameter: returns all courses
+    Responses carry an ETag; send it back in If-None-Match to get 304 Not Modified while courses are unchanged.
     """
+    # The ETag and the body both come from this snapshot, so they always match
+    catalogue = course_cache.get(db)
+    not_modified = etags.check_not_modified(request, response, table_version.COURSES, db, version=catalogue.version)
+    if not_modified:
+        return not_modified
     if search:
-        return course.search(search, db)
-    return course.all(db)
+        return fast_json.respond(course.search(search, db, catalogue), response)
+    return fast_json.respond(course.all(catalogue, page, response), response)
 
 #SEARCH (alternative endpoint)
 @router.get('/search', response_model=List[schemas.ShowCourse])
 def search_courses(
+    response: Response,
     q: str = Query(..., description="Search query for course code, title, or instructors"),
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(oauth2.get_current_user)
@@ -46,11 +84,15 @@ def search_courses(
     Search courses by course code, title, or instructors.
     Returns all courses that match the search query in any of these fields.
     """
-    return course.search(q, db)
+    return fast_json.respond(course.search(q, db, course_cache.get(db)), response)
 
 @router.get('/{id}', status_code=200, response_model=schemas.ShowCourse)
-def show(id:int, response: Response, db: Session = Depends(database.get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
-    return course.show(id, response, db)
+def show(id:int, request: Request, response: Response, db: Session = Depends(database.get_db), current_user: schemas.User = Depends(oauth2.get_current_user)):
+    catalogue = course_cache.get(db)
+    not_modified = etags.check_not_modified(request, response, table_version.COURSES, db, version=catalogue.version)
+    if not_modified:
+        return not_modified
+    return course.show(id, catalogue)
 
 #DELETE
 @router.delete('/{id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List
+from sqlalchemy.orm import Session
+
+import schemas
+import database
+import oauth2
+import models
+from leaderboard import leaderboard
+
+router = APIRouter(
+    tags=['Leaderboard'],
+    prefix="/leaderboard"
+)
+
+DEFAULT_LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+
+
+@router.get('/', response_model=List[schemas.LeaderboardEntry])
+def get_leaderboard(
+    limit: int = Query(DEFAULT_LEADERBOARD_SIZE, ge=1, le=MAX_LEADERBOARD_SIZE),
+    db: Session = Depends(database.get_db),
+    current_user: schemas.User = Depends(oauth2.get_current_user)
+):
+    """Users with the most karma"""
+    return leaderboard.top(db, limit)
+
+
+@router.get('/course/{course_id}', response_model=List[schemas.LeaderboardEntry])
+def get_course_leaderboard(
+    course_id: int,
+    limit: int = Query(DEFAULT_LEADERBOARD_SIZE, ge=1, le=MAX_LEADERBOARD_SIZE),
+    db: Session = Depends(database.get_db),
+    current_user: schemas.User = Depends(oauth2.get_current_user)
+):
+    """Users who earned the most karma by uploading materials to a course"""
+    if not db.query(models.Course.id).filter(models.Course.id == course_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with id {course_id} not found")
+    return leaderboard.top(db, limit, course_id)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, Response, UploadFile, File
+from fastapi import APIRouter, Depends, status, Request, Response, UploadFile, File, HTTPException
 from typing import List
 from sqlalchemy.orm import Session
 
@@ -6,8 +6,14 @@ import schemas
 import database
 import oauth2
 import models
-from repository import material
+import pagination
+import etags
+import fast_json
+from repository import material, table_version
+import s3_service
 from s3_service import upload_file_to_s3
+from text_extraction import resolve_mime_type
+import extraction_worker
 
 router = APIRouter(
     tags=['Course Materials'],
@@ -24,20 +30,47 @@ def create(
     """Create a new course material. user_id is automatically set from the current authenticated user."""
     return material.create(request, current_user.id, db)
 
+@router.post('/bulk', response_model=schemas.MaterialBulkResponse)
+def create_bulk(
+    requests: List[schemas.CourseMaterial],
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(oauth2.get_current_user)
+):
+    """
+    Create several course materials at once, in one transaction.
+    Returns a result per item (in request order); items whose course does not exist are
+    reported as errors while the others are created.
+    """
+    return material.create_many(requests, current_user.id, db)
+
 #GET
 @router.get('/', response_model=List[schemas.ShowCourseMaterial])
-def all(db: Session = Depends(database.get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    """Get all course materials"""
-    return material.all(db)
+def all(
+    response: Response,
+    page: pagination.Page = Depends(pagination.page_params),
+    db: Session = Depends(database.get_db), 
+    current_user: models.User = Depends(oauth2.get_current_user)
+):
+    """Get one page of course materials (next page cursor in the X-Next-Cursor header)"""
+    return fast_json.respond(material.all(db, page, response), response)
 
 @router.get('/course/{course_id}', response_model=List[schemas.ShowCourseMaterial])
 def get_by_course(
     course_id: int,
+    request: Request,
+    response: Response,
+    page: pagination.Page = Depends(pagination.page_params),
     db: Session = Depends(database.get_db), 
     current_user: models.User = Depends(oauth2.get_current_user)
 ):
-    """Get all materials for a specific course"""
-    return material.get_by_course(course_id, db)
+    """
+    Get one page of the materials for a specific course (next page cursor in the X-Next-Cursor header).
+    Responses carry an ETag; send it back in If-None-Match to get 304 Not Modified while the course's materials are unchanged.
+    """
+    not_modified = etags.check_not_modified(request, response, table_version.course_materials(course_id), db)
+    if not_modified:
+        return not_modified
+    return fast_json.respond(material.get_by_course(course_id, db, page, response), response)
 
 @router.get('/{id}', status_code=200, response_model=schemas.ShowCourseMaterial)
 def show(
@@ -60,6 +93,15 @@ def destroy(
     return material.destroy(id, db)
 
 #PUT
+@router.put('/bulk', response_model=schemas.MaterialBulkResponse)
+def update_bulk(
+    requests: List[schemas.CourseMaterialBulkUpdate],
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(oauth2.get_current_user)
+):
+    """Update several course materials at once, in one transaction, with a result per item"""
+    return material.update_many(requests, db)
+
 @router.put('/{id}', status_code=status.HTTP_202_ACCEPTED, response_model=schemas.ShowCourseMaterial)
 def update(
     id: int, 
@@ -85,15 +127,66 @@ def upload_file(
     - **file**: The file to upload (multipart/form-data)
     
     Returns the updated material with the S3 file URL.
+    Text extraction for the chatbot runs in the background after the response.
     """
     # Get the material to verify it exists and get course_id
     material_obj = material.show(material_id, Response(), db)
     
-    # Upload file to S3
-    file_url = upload_file_to_s3(file, material_id, material_obj.course_id)
+    # Stream the file to S3, normalizing the content type (browsers often send application/octet-stream)
+    content_type = resolve_mime_type(file.filename, file.content_type) or file.content_type
+    uploaded = upload_file_to_s3(file, material_id, material_obj.course_id, content_type)
+    file_url = uploaded.url
+    
+    # Update the material's file_link, recording type and size so readers never have to probe the file
+    updated_material = material.update_file_link(material_id, file_url, db, uploaded.content_type, uploaded.size)
     
-    # Update the material's file_link
-    updated_material = material.update_file_link(material_id, file_url, db)
+    # Hand the file we already have to the extraction workers
+    extraction_worker.submit(material_id, file_url, file.file, file.filename, uploaded.content_type)
     
     return updated_material
 
+
+#DIRECT UPLOAD (client -> S3)
+@router.post('/{material_id}/upload-url', response_model=schemas.PresignedUpload)
+def create_upload_url(
+    material_id: int,
+    request: schemas.UploadUrlRequest,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(oauth2.get_current_user)
+):
+    """
+    Step 1 of a direct upload: get a presigned S3 POST form (default) or PUT URL for the
+    material's file. The client uploads the bytes straight to S3, then calls upload-complete
+    with the returned key.
+    """
+    material_obj = material.show(material_id, Response(), db)
+    content_type = resolve_mime_type(request.filename, request.content_type) or request.content_type
+    return s3_service.create_presigned_upload(
+        material_id, material_obj.course_id, request.filename, content_type, request.method
+    )
+
+@router.post('/{material_id}/upload-complete', response_model=schemas.ShowCourseMaterial)
+def complete_upload(
+    material_id: int,
+    request: schemas.UploadComplete,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(oauth2.get_current_user)
+):
+    """
+    Step 2 of a direct upload: verify the object exists in S3 and set it as the material's file.
+    Text extraction for the chatbot runs in the background.
+    """
+    material_obj = material.show(material_id, Response(), db)
+    if not request.key.startswith(s3_service.material_key_prefix(material_obj.course_id, material_id)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key does not belong to this material")
+    
+    uploaded = s3_service.head_object(request.key)
+    if uploaded is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No uploaded file found for key {request.key}")
+    if uploaded["size"] == 0 or uploaded["size"] > s3_service.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Uploaded file size {uploaded['size']} is not accepted")
+    
+    file_url = s3_service.object_url(request.key)
+    updated_material = material.update_file_link(material_id, file_url, db, uploaded["content_type"], uploaded["size"])
+    extraction_worker.submit_s3_object(material_id, file_url, request.key, uploaded["content_type"])
+    return updated_material
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 import schemas
 import database
 import oauth2
-import models
+import hashing
 from repository import user
+from user_cache import CurrentUser
+from leaderboard import leaderboard
 
 router = APIRouter(
     tags=['Users'],
@@ -13,45 +16,50 @@ router = APIRouter(
 )
 
 @router.post('/', response_model=schemas.ShowUser)
-def create_user(request: schemas.User, db:Session = Depends(database.get_db)):
-    return user.create_user(request, db)
+async def create_user(request: schemas.User, db:Session = Depends(database.get_db)):
+    # Async so no request thread waits for bcrypt; the insert runs on the threadpool
+    hashed_password = await hashing.Hash.bcrypt(request.password)
+    return await run_in_threadpool(user.create_user, request, hashed_password, db)
 
 @router.get('/{id}', response_model=schemas.ShowUser)
 def get_user(id: int, db: Session = Depends(database.get_db)):
     return user.get_user(id, db)
 
-@router.get('/me/current', response_model=schemas.ShowUser)
+@router.get('/me/current', response_model=schemas.ShowCurrentUser)
 def get_current_user_info(
-    current_user: models.User = Depends(oauth2.get_current_user),
+    current_user: CurrentUser = Depends(oauth2.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    """Get current authenticated user information including karma"""
+    """Get current authenticated user information including karma and leaderboard rank"""
+    # The authenticated principal may come from cache or token claims, so read karma fresh
+    db_user = user.get_user(current_user.id, db)
     try:
         # Get karma, defaulting to 0 if column doesn't exist or is None
-        karma_value = getattr(current_user, 'karma', None)
+        karma_value = getattr(db_user, 'karma', None)
         if karma_value is None:
             karma_value = 0
             # Try to initialize karma for existing users
             try:
-                current_user.karma = 0
+                db_user.karma = 0
                 db.commit()
-                db.refresh(current_user)
+                db.refresh(db_user)
             except Exception:
                 # If karma column doesn't exist, just return 0
                 db.rollback()
                 pass
         
         return {
-            "id": current_user.id,
-            "name": current_user.name,
-            "email": current_user.email,
-            "karma": karma_value
+            "id": db_user.id,
+            "name": db_user.name,
+            "email": db_user.email,
+            "karma": karma_value,
+            "rank": leaderboard.rank(db_user.id, karma_value, db)
         }
     except Exception as e:
         # Fallback if anything goes wrong
         return {
-            "id": current_user.id,
-            "name": current_user.name,
-            "email": current_user.email,
+            "id": db_user.id,
+            "name": db_user.name,
+            "email": db_user.email,
             "karma": 0
         }
@@ -1,7 +1,13 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import base64
+import hashlib
 import os
-from typing import Optional
+import threading
+from typing import BinaryIO, Optional
 import uuid
 from fastapi import UploadFile, HTTPException, status
 from dotenv import load_dotenv
@@ -14,67 +20,221 @@ AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+# S3-compatible endpoint (MinIO, a local moto server, ...); unset for AWS itself
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+
+# Lifetime of presigned upload URLs/forms
+PRESIGNED_UPLOAD_EXPIRES_SECONDS = int(os.getenv("PRESIGNED_UPLOAD_EXPIRES_SECONDS", "900"))
+# Largest object a presigned POST accepts (enforced by S3) or upload-complete accepts
+MAX_UPLOAD_BYTES = int(os.getenv("S3_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+
+# Files larger than one part are sent as a multipart upload of parts of this size (S3 minimum: 5 MiB)
+S3_PART_SIZE = max(5 * 1024 * 1024, int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))))
+# Parts of one upload in flight at once; memory per upload is about S3_PART_SIZE * (S3_UPLOAD_CONCURRENCY + 1)
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+# Threads shared by all uploads for sending parts
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "16"))
+
+_part_executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS, thread_name_prefix="s3-part")
+
+@dataclass
+class UploadedObject:
+    key: str
+    url: str
+    size: int
+    etag: str
+    content_type: str
 
 # Initialize S3 client
 s3_client = boto3.client(
     's3',
     aws_access_key_id=AWS_ACCESS_KEY_ID,
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
+    region_name=AWS_REGION,
+    endpoint_url=S3_ENDPOINT_URL,
+    # Custom endpoints generally don't resolve bucket subdomains
+    config=Config(s3={'addressing_style': 'path'}) if S3_ENDPOINT_URL else None
 )
 
-def upload_file_to_s3(file: UploadFile, material_id: int, course_id: int) -> str:
+def check_s3_config():
+    """Raise a 500 if the S3 settings needed to store files are missing"""
+    if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY or not S3_BUCKET_NAME:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AWS S3 configuration is missing. Please set AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, and S3_BUCKET_NAME environment variables."
+        )
+
+def material_key_prefix(course_id: int, material_id: int) -> str:
+    return f"courses/{course_id}/materials/{material_id}/"
+
+def material_key(course_id: int, material_id: int, filename: Optional[str]) -> str:
+    """Unique object key for a material file: courses/{course_id}/materials/{material_id}/{uuid}.{ext}"""
+    file_extension = os.path.splitext(filename)[1] if filename else ""
+    return f"{material_key_prefix(course_id, material_id)}{uuid.uuid4()}{file_extension}"
+
+def object_url(key: str) -> str:
+    """Public URL of an object in the bucket"""
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{S3_BUCKET_NAME}/{key}"
+    return f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{key}"
+
+def upload_file_to_s3(file: UploadFile, material_id: int, course_id: int, content_type: Optional[str] = None) -> UploadedObject:
     """
-    Upload a file to S3 and return the public URL
+    Stream an uploaded file to S3 (see upload_fileobj_to_s3)
     
     Args:
         file: FastAPI UploadFile object
         material_id: ID of the course material
         course_id: ID of the course
+        content_type: Content type to store, defaults to the one sent by the client
     
     Returns:
-        str: Public URL of the uploaded file
+        UploadedObject: key, public URL and size of the stored file
     
     Raises:
         HTTPException: If AWS credentials are not configured or upload fails
     """
     # Validate AWS configuration
-    if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY or not S3_BUCKET_NAME:
+    check_s3_config()
+    
+    try:
+        # Generate unique filename: course_id/material_id/uuid.ext
+        s3_key = material_key(course_id, material_id, file.filename)
+        file.file.seek(0)
+        return upload_fileobj_to_s3(file.file, s3_key, content_type or file.content_type or "application/octet-stream")
+    
+    except ClientError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="AWS S3 configuration is missing. Please set AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, and S3_BUCKET_NAME environment variables."
+            detail=f"Failed to upload file to S3: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Unexpected error during file upload: {str(e)}"
         )
+
+def upload_fileobj_to_s3(fileobj: BinaryIO, key: str, content_type: str) -> UploadedObject:
+    """
+    Upload a readable file object to S3 without loading it whole.
+    Files up to S3_PART_SIZE go in a single PUT; larger ones as a multipart upload whose
+    parts are read one at a time and sent in parallel. Every request carries the SHA-256 of
+    its body, so S3 rejects data corrupted on the way.
+    """
+    first_part = fileobj.read(S3_PART_SIZE)
+    if len(first_part) < S3_PART_SIZE:
+        response = s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=key, Body=first_part, ContentType=content_type,
+                                        ChecksumSHA256=_sha256_checksum(first_part))
+        return UploadedObject(key, object_url(key), len(first_part), (response.get('ETag') or '').strip('"'), content_type)
+    return _multipart_upload(fileobj, key, content_type, first_part)
+
+def _sha256_checksum(data: bytes) -> str:
+    """SHA-256 of data in the base64 form S3 expects in ChecksumSHA256"""
+    return base64.b64encode(hashlib.sha256(data).digest()).decode('ascii')
+
+def _multipart_upload(fileobj: BinaryIO, key: str, content_type: str, first_part: bytes) -> UploadedObject:
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=S3_BUCKET_NAME, Key=key, ContentType=content_type, ChecksumAlgorithm='SHA256'
+    )['UploadId']
+    # Reading the next part waits for a free slot, which bounds the parts held in memory
+    slots = threading.BoundedSemaphore(S3_UPLOAD_CONCURRENCY)
+    failed = threading.Event()
+    
+    def upload_part(part_number: int, data: bytes) -> dict:
+        try:
+            checksum = _sha256_checksum(data)
+            response = s3_client.upload_part(
+                Bucket=S3_BUCKET_NAME, Key=key, UploadId=upload_id, PartNumber=part_number, Body=data,
+                ChecksumSHA256=checksum
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag'], 'ChecksumSHA256': checksum}
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            slots.release()
     
+    size = 0
+    futures = []
     try:
-        # Generate unique filename: course_id/material_id/original_filename-uuid.ext
-        file_extension = os.path.splitext(file.filename)[1] if file.filename else ""
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        s3_key = f"courses/{course_id}/materials/{material_id}/{unique_filename}"
+        part, part_number = first_part, 1
+        while part:
+            size += len(part)
+            slots.acquire()
+            if failed.is_set():
+                break  # Stop reading; the failed part's error is raised below
+            futures.append(_part_executor.submit(upload_part, part_number, part))
+            part, part_number = fileobj.read(S3_PART_SIZE), part_number + 1
         
-        # Read file content
-        file_content = file.file.read()
+        parts = [future.result() for future in futures]
+        response = s3_client.complete_multipart_upload(
+            Bucket=S3_BUCKET_NAME, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+        )
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        try:
+            s3_client.abort_multipart_upload(Bucket=S3_BUCKET_NAME, Key=key, UploadId=upload_id)
+            print(f"Aborted multipart upload of {key}")
+        except Exception as e:
+            print(f"⚠️ Could not abort multipart upload of {key}: {e}")
+        raise
+    
+    print(f"Uploaded {size} bytes to {key} in {len(parts)} parts")
+    return UploadedObject(key, object_url(key), size, (response.get('ETag') or '').strip('"'), content_type)
+
+def create_presigned_upload(material_id: int, course_id: int, filename: str, content_type: Optional[str], method: str = "post") -> dict:
+    """
+    Presign a direct browser-to-S3 upload of a material file.
+    'post' returns a form (url + fields, the file goes last) limited to MAX_UPLOAD_BYTES;
+    'put' returns a URL to PUT the raw bytes to, with the headers the request must send.
+    """
+    check_s3_config()
+    key = material_key(course_id, material_id, filename)
+    content_type = content_type or "application/octet-stream"
+    try:
+        if method == "put":
+            url = s3_client.generate_presigned_url(
+                'put_object',
+                Params={'Bucket': S3_BUCKET_NAME, 'Key': key, 'ContentType': content_type},
+                ExpiresIn=PRESIGNED_UPLOAD_EXPIRES_SECONDS
+            )
+            return {"method": "put", "url": url, "fields": {}, "headers": {"Content-Type": content_type},
+                    "key": key, "expires_in": PRESIGNED_UPLOAD_EXPIRES_SECONDS}
         
-        # Upload to S3
-        s3_client.put_object(
+        post = s3_client.generate_presigned_post(
             Bucket=S3_BUCKET_NAME,
-            Key=s3_key,
-            Body=file_content,
-            ContentType=file.content_type or "application/octet-stream"
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, MAX_UPLOAD_BYTES]],
+            ExpiresIn=PRESIGNED_UPLOAD_EXPIRES_SECONDS
         )
-        
-        # Generate public URL
-        file_url = f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
-        
-        return file_url
-    
+        return {"method": "post", "url": post["url"], "fields": post["fields"], "headers": {},
+                "key": key, "expires_in": PRESIGNED_UPLOAD_EXPIRES_SECONDS}
     except ClientError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to upload file to S3: {str(e)}"
+            detail=f"Failed to presign upload: {str(e)}"
         )
-    except Exception as e:
+
+def head_object(key: str) -> Optional[dict]:
+    """Size, content type and ETag of an object, or None if it does not exist"""
+    check_s3_config()
+    try:
+        response = s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Unexpected error during file upload: {str(e)}"
+            detail=f"Failed to check uploaded file: {str(e)}"
         )
+    return {
+        "size": response.get('ContentLength', 0),
+        "content_type": response.get('ContentType'),
+        "etag": (response.get('ETag') or '').strip('"'),
+    }
 
+def download_fileobj(key: str, file):
+    """Stream an object into a writable file object (multipart ranged GETs for large objects)"""
+    s3_client.download_fileobj(S3_BUCKET_NAME, key, file)
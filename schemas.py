@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 class User(BaseModel):
     name:str
@@ -10,6 +10,7 @@ class CourseBase(BaseModel):
     course_code: str
     title: str
     instructors: str
+    credits: Optional[int] = None
 
 class Course(CourseBase):
     class Config():
@@ -20,10 +21,22 @@ class ShowCourse(BaseModel):
     course_code: str
     title: str
     instructors: str
+    credits: Optional[int] = None
 
     class Config():
         from_attributes = True
 
+class CourseImportReport(BaseModel):
+    rows: int
+    inserted: int
+    updated: int
+    unchanged: int
+    skipped: int
+    batches: int
+    seconds: float
+    rows_per_second: float
+    errors: List[str]
+
 class ShowUser(BaseModel):
     id: int
     name: str
@@ -32,6 +45,15 @@ class ShowUser(BaseModel):
     class Config():
         from_attributes = True
 
+class ShowCurrentUser(ShowUser):
+    rank: Optional[int] = None  # Position on the global karma leaderboard
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    name: Optional[str] = None
+    karma: int
+
 
 
 class Login(BaseModel):
@@ -45,6 +67,8 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: str | None = None
+    user_id: int | None = None  # 'uid' claim, absent in tokens issued before it was added
+    name: str | None = None
 
 class CourseMaterialBase(BaseModel):
     course_id: int
@@ -69,6 +93,39 @@ class ShowCourseMaterial(BaseModel):
     score: int
     file_link: str
     user_id: int
+    content_type: Optional[str] = None
+    file_size: Optional[int] = None
 
     class Config():
         from_attributes = True
+
+class CourseMaterialBulkUpdate(CourseMaterialBase):
+    id: int
+
+class MaterialBulkResult(BaseModel):
+    index: int  # Position of the item in the request
+    status: str  # 'created', 'updated' or 'error'
+    material: Optional[ShowCourseMaterial] = None
+    detail: Optional[str] = None
+
+class MaterialBulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    karma_awarded: int = 0
+    results: List[MaterialBulkResult]
+
+class UploadUrlRequest(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    method: Literal['post', 'put'] = 'post'
+
+class PresignedUpload(BaseModel):
+    method: str  # 'post': multipart form with `fields` then the file; 'put': raw bytes with `headers`
+    url: str
+    fields: Dict[str, str] = {}
+    headers: Dict[str, str] = {}
+    key: str  # Send back to upload-complete
+    expires_in: int
+
+class UploadComplete(BaseModel):
+    key: str
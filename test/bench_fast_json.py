@@ -0,0 +1,136 @@
+"""
+Check that the fast JSON list responses (fast_json.py) are byte-for-byte the same as
+the response_model output they replace, then benchmark both on 10k-row lists.
+Profiles: ORM objects through response_model=List[...] (previous code), column-only
+rows encoded by fast_json, and the cached course catalogue (course_cache.py) encoded
+by fast_json. The compatibility check also runs the stdlib json fallback.
+Run from the project root: python test/bench_fast_json.py
+Works on a throw-away database in a temporary directory; courses.db is not touched.
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends, FastAPI, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import fast_json
+import models
+import schemas
+from course_cache import CourseCache
+
+ROWS = 10_000
+ITERATIONS = 10
+# Strings that differ between JSON encoders if any of them escapes differently
+TRICKY = ['plain', 'quote " and \\ backslash', 'tab\tnew\nline', 'ctrl \x01\x1f\x7f', 'unicode é ü 中文 🚀',
+          'line sep \u2028 \u2029', '</script>', '']
+
+
+def seed(engine):
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Course), [
+            {"id": i, "course_code": f"C{i:05d}", "title": f"Course {i} {TRICKY[i % len(TRICKY)]}",
+             "instructors": TRICKY[(i * 3) % len(TRICKY)], "credits": None if i % 5 == 0 else i % 5}
+            for i in range(1, ROWS + 1)
+        ])
+        conn.execute(insert(models.CourseMaterial), [
+            {"id": i, "course_id": 1, "title": f"Material {i} {TRICKY[i % len(TRICKY)]}", "type": i % 3,
+             "description": TRICKY[(i * 7) % len(TRICKY)], "role": i % 2 == 0, "score": i - ROWS // 2,
+             "file_link": f"https://bucket.example.com/materials/{i}.pdf", "user_id": i % 50 + 1,
+             "content_type": None if i % 4 == 0 else "application/pdf", "file_size": None if i % 4 == 0 else i * 1024}
+            for i in range(1, ROWS + 1)
+        ])
+
+
+def build_app(SessionLocal) -> FastAPI:
+    app = FastAPI()
+    course_cache = CourseCache(check_seconds=60)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/orm/courses", response_model=List[schemas.ShowCourse])
+    def orm_courses(db=Depends(get_db)):
+        return db.query(models.Course).order_by(models.Course.id).all()
+
+    @app.get("/fast/courses", response_model=List[schemas.ShowCourse])
+    def fast_courses(response: Response, db=Depends(get_db)):
+        rows = db.query(*fast_json.schema_columns(models.Course, schemas.ShowCourse)).order_by(models.Course.id).all()
+        return fast_json.respond(fast_json.rows_as_dicts(rows), response)
+
+    @app.get("/cached/courses", response_model=List[schemas.ShowCourse])
+    def cached_courses(response: Response, db=Depends(get_db)):
+        return fast_json.respond(course_cache.get(db).courses, response)
+
+    @app.get("/orm/materials", response_model=List[schemas.ShowCourseMaterial])
+    def orm_materials(db=Depends(get_db)):
+        return db.query(models.CourseMaterial).order_by(models.CourseMaterial.id).all()
+
+    @app.get("/fast/materials", response_model=List[schemas.ShowCourseMaterial])
+    def fast_materials(response: Response, db=Depends(get_db)):
+        rows = (db.query(*fast_json.schema_columns(models.CourseMaterial, schemas.ShowCourseMaterial))
+                .order_by(models.CourseMaterial.id).all())
+        return fast_json.respond(fast_json.rows_as_dicts(rows), response)
+
+    return app
+
+
+def check_compatibility(client: TestClient):
+    encoders = [("orjson", fast_json.orjson), ("json", None)] if fast_json.orjson is not None else [("json", None)]
+    orjson_module = fast_json.orjson
+    for resource, fast_paths in [("courses", ["fast", "cached"]), ("materials", ["fast"])]:
+        expected = client.get(f"/orm/{resource}")
+        for encoder, module in encoders:
+            fast_json.orjson = module
+            for path in fast_paths:
+                got = client.get(f"/{path}/{resource}")
+                same = got.content == expected.content and got.headers["content-type"] == expected.headers["content-type"]
+                print(f"{'✅' if same else '❌'} {path}/{resource} ({encoder}): {len(got.content)} bytes")
+                if not same:
+                    position = next((i for i, (a, b) in enumerate(zip(got.content, expected.content)) if a != b),
+                                    min(len(got.content), len(expected.content)))
+                    print(f"   first difference at byte {position}: {got.content[position - 40:position + 40]!r}"
+                          f" != {expected.content[position - 40:position + 40]!r}")
+                    sys.exit(1)
+    fast_json.orjson = orjson_module
+
+
+def benchmark(client: TestClient):
+    print(f"{ROWS} rows per response, {ITERATIONS} requests per profile, encoder: "
+          f"{'orjson' if fast_json.orjson is not None else 'json'}")
+    print(f"{'profile':<20} {'ms/request':>12} {'speedup':>8}")
+    for resource, paths in [("courses", ["orm", "fast", "cached"]), ("materials", ["orm", "fast"])]:
+        baseline = None
+        for path in paths:
+            client.get(f"/{path}/{resource}")  # Warm up (and load the catalogue)
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                client.get(f"/{path}/{resource}")
+            ms = (time.perf_counter() - start) / ITERATIONS * 1000
+            baseline = baseline or ms
+            print(f"{path + '/' + resource:<20} {ms:>12.1f} {baseline / ms:>7.1f}x")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", connect_args={"check_same_thread": False})
+        seed(engine)
+        with TestClient(build_app(sessionmaker(bind=engine))) as client:
+            check_compatibility(client)
+            benchmark(client)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark serial vs page-parallel (process pool) PDF text extraction.
+Run from the project root: python test/bench_pdf_extraction.py
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import text_extraction
+
+PAGE_COUNTS = [10, 100, 500]
+LINES_PER_PAGE = 40
+REPEATS = 3
+
+
+def make_pdf(pages: int) -> bytes:
+    """Build a text-only PDF with `pages` pages of Helvetica text."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for page_num in range(pages):
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+        lines = "".join(
+            f"(Page {page_num} line {line}: the quick brown fox jumps over the lazy dog) Tj 0 -16 Td "
+            for line in range(LINES_PER_PAGE)
+        )
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 10 Tf 40 760 Td {lines}ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def best_of(fn, repeats=REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    # Keep the per-page progress output of the extractor out of the report
+    real_stdout = sys.stdout
+    print(f"{'pages':>6} {'serial (s)':>11} {'parallel (s)':>13} {'speedup':>8}   workers={text_extraction.PDF_PROCESS_WORKERS}")
+
+    # Warm up the process pool so process start-up is not billed to the first document
+    text_extraction._get_pdf_pool().submit(len, "").result()
+
+    for pages in PAGE_COUNTS:
+        data = make_pdf(pages)
+        sys.stdout = open(os.devnull, "w")
+        try:
+            serial_text = text_extraction.extract_pdf(io.BytesIO(data), parallel=False).text
+            parallel_text = text_extraction.extract_pdf(io.BytesIO(data), parallel=True).text
+            assert serial_text == parallel_text, "parallel extraction changed the text"
+            serial = best_of(lambda: text_extraction.extract_pdf(io.BytesIO(data), parallel=False))
+            parallel = best_of(lambda: text_extraction.extract_pdf(io.BytesIO(data), parallel=True))
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        print(f"{pages:>6} {serial:>11.3f} {parallel:>13.3f} {serial / parallel:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
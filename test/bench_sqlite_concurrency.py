@@ -0,0 +1,135 @@
+"""
+Benchmark read throughput on SQLite while other threads keep writing, comparing the
+previous engine setup (rollback journal, default pool, no pragmas) with the tuned
+profile of database.py (WAL, synchronous=NORMAL, busy_timeout, cache/mmap, larger pool).
+Run from the project root: python test/bench_sqlite_concurrency.py
+Works on throw-away databases in a temporary directory; courses.db is not touched.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+import database
+
+COURSES = 10_000
+USERS = 200
+READERS = 16
+WRITERS = 4
+DURATION_SECONDS = 5
+
+
+def seed(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE courses (id INTEGER PRIMARY KEY, course_code TEXT, title TEXT, instructors TEXT)"))
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, karma INTEGER DEFAULT 0)"))
+        conn.execute(
+            text("INSERT INTO courses (id, course_code, title, instructors) VALUES (:id, :code, :title, :instructors)"),
+            [{"id": i, "code": f"C{i:05d}", "title": f"Course {i}", "instructors": "Staff"} for i in range(1, COURSES + 1)]
+        )
+        conn.execute(
+            text("INSERT INTO users (id, name, karma) VALUES (:id, :name, 0)"),
+            [{"id": i, "name": f"user {i}"} for i in range(1, USERS + 1)]
+        )
+
+
+def make_engine(path: str, tuned: bool):
+    url = f"sqlite:///{path}"
+    if not tuned:
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+
+        @event.listens_for(engine, "connect")
+        def rollback_journal(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA journal_mode = DELETE")
+        return engine
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": database.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=database.DB_POOL_SIZE,
+        max_overflow=database.DB_MAX_OVERFLOW,
+        pool_timeout=database.DB_POOL_TIMEOUT,
+    )
+    event.listen(engine, "connect", database.apply_sqlite_pragmas)
+    return engine
+
+
+def run(engine) -> dict:
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": 0, "writes": 0, "errors": 0, "read_latencies": []}
+
+    def reader(n):
+        latencies = []
+        reads = errors = 0
+        i = n
+        while not stop.is_set():
+            i = (i * 7919 + 1) % COURSES + 1
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT * FROM courses WHERE id = :id"), {"id": i}).fetchall()
+                    conn.execute(text("SELECT id, title FROM courses WHERE id > :id ORDER BY id LIMIT 100"), {"id": i}).fetchall()
+                reads += 1
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors += 1
+        with lock:
+            stats["reads"] += reads
+            stats["errors"] += errors
+            stats["read_latencies"].extend(latencies)
+
+    def writer(n):
+        writes = errors = 0
+        i = n
+        while not stop.is_set():
+            i = i % USERS + 1
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("UPDATE users SET karma = karma + 1 WHERE id = :id"), {"id": i})
+                writes += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            stats["writes"] += writes
+            stats["errors"] += errors
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(READERS)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(stats["read_latencies"]) or [0.0]
+    return {
+        "reads_per_s": stats["reads"] / DURATION_SECONDS,
+        "writes_per_s": stats["writes"] / DURATION_SECONDS,
+        "errors": stats["errors"],
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    print(f"{READERS} reader threads, {WRITERS} writer threads, {DURATION_SECONDS}s per profile")
+    print(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'errors':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, tuned in [("default", False), ("tuned", True)]:
+            engine = make_engine(os.path.join(tmp, f"{name}.db"), tuned)
+            seed(engine)
+            result = run(engine)
+            engine.dispose()
+            print(f"{name:<10} {result['reads_per_s']:>10.0f} {result['writes_per_s']:>10.0f} "
+                  f"{result['errors']:>8} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Check the direct-to-S3 upload flow (POST /material/{id}/upload-url, then
+POST /material/{id}/upload-complete) against moto's in-process S3 mock:
+presigned POST and PUT uploads, the file metadata and extracted text stored on
+completion, and the rejection of a key belonging to another material or never uploaded.
+Needs moto: pip install -r requirements-dev.txt
+Run from the project root: python test/presigned_upload.py
+Runs the app on a throw-away database in a temporary directory; courses.db and real
+AWS are not touched.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+# Fake credentials and bucket, set before s3_service reads them
+os.environ.update({
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_REGION": "us-east-1",
+    "S3_BUCKET_NAME": "presigned-upload-test",
+})
+os.environ.pop("S3_ENDPOINT_URL", None)
+
+import boto3
+import requests
+from moto import mock_aws
+
+FILE_TEXT = b"Lecture notes: presigned uploads go straight from the client to S3.\n"
+failures = []
+
+
+def check(name: str, ok: bool, detail=""):
+    print(f"{'✅' if ok else '❌'} {name}" + (f": {detail}" if detail and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def create_material(client, headers, course_id: int) -> int:
+    response = client.post("/material/", headers=headers, json={
+        "course_id": course_id, "title": "Notes", "type": 1, "description": "Week 1", "role": True, "score": 0
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def upload(presigned: dict, content: bytes) -> requests.Response:
+    """Send the file to S3 the way a browser would, using only what upload-url returned"""
+    if presigned["method"] == "put":
+        return requests.put(presigned["url"], data=content, headers=presigned["headers"])
+    return requests.post(presigned["url"], data=presigned["fields"], files={"file": ("notes.txt", content)})
+
+
+def run(client, headers, course_id: int):
+    import extraction_worker
+
+    for method in ("post", "put"):
+        material_id = create_material(client, headers, course_id)
+        response = client.post(f"/material/{material_id}/upload-url", headers=headers,
+                               json={"filename": "notes.txt", "method": method})
+        check(f"{method}: upload-url", response.status_code == 200, response.text)
+        presigned = response.json()
+        check(f"{method}: key under the material's prefix",
+              presigned["key"].startswith(f"courses/{course_id}/materials/{material_id}/"), presigned["key"])
+
+        s3_response = upload(presigned, FILE_TEXT)
+        check(f"{method}: upload to S3", s3_response.status_code in (200, 204), s3_response.text)
+
+        response = client.post(f"/material/{material_id}/upload-complete", headers=headers, json={"key": presigned["key"]})
+        check(f"{method}: upload-complete", response.status_code == 200, response.text)
+        body = response.json()
+        check(f"{method}: file_link set", body.get("file_link", "").endswith(presigned["key"]), body)
+        check(f"{method}: content type and size stored",
+              body.get("content_type") == "text/plain" and body.get("file_size") == len(FILE_TEXT), body)
+
+    # A key presigned for another material must not be attachable
+    other_id = create_material(client, headers, course_id)
+    presigned = client.post(f"/material/{other_id}/upload-url", headers=headers, json={"filename": "notes.txt"}).json()
+    upload(presigned, FILE_TEXT)
+    target_id = create_material(client, headers, course_id)
+    response = client.post(f"/material/{target_id}/upload-complete", headers=headers, json={"key": presigned["key"]})
+    check("key of another material rejected with 400", response.status_code == 400, response.text)
+
+    # A key under the right prefix that was never uploaded
+    presigned = client.post(f"/material/{target_id}/upload-url", headers=headers, json={"filename": "notes.txt"}).json()
+    response = client.post(f"/material/{target_id}/upload-complete", headers=headers, json={"key": presigned["key"]})
+    check("missing object rejected with 404", response.status_code == 404, response.text)
+
+    response = client.post("/material/999999/upload-url", headers=headers, json={"filename": "notes.txt"})
+    check("unknown material rejected with 404", response.status_code == 404, response.text)
+
+    # Background extraction downloads from the mock too, so wait for it before leaving mock_aws
+    extraction_worker._executor.shutdown(wait=True)
+    texts = sqlite3.connect("courses.db").execute("SELECT content FROM material_texts").fetchall()
+    check("text extracted in the background", len(texts) == 2 and all(FILE_TEXT.decode().strip() in t[0] for t in texts), texts)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, mock_aws():
+        os.chdir(tmp)  # database.py uses ./courses.db
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=os.environ["S3_BUCKET_NAME"])
+
+        from fastapi.testclient import TestClient
+        import main as app_main
+
+        with TestClient(app_main.app) as client:
+            conn = sqlite3.connect("courses.db")
+            course_id = conn.execute(
+                "INSERT INTO courses (course_code, title, instructors) VALUES ('TST 101', 'Test Course', 'Staff')"
+            ).lastrowid
+            conn.commit()
+            conn.close()
+
+            client.post("/user/", json={"name": "Uploader", "email": "uploader@example.com", "password": "pw"})
+            token = client.post("/login", data={"username": "uploader@example.com", "password": "pw"}).json()["access_token"]
+            run(client, {"Authorization": f"Bearer {token}"}, course_id)
+        os.chdir(PROJECT_DIR)
+
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("All checks passed")
+
+
+if __name__ == '__main__':
+    main()
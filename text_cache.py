@@ -0,0 +1,61 @@
+"""
+In-process cache for text extracted from course material files.
+Entries are keyed by material id and tagged with the file_link they were extracted from:
+every upload gets a fresh S3 key, so the file_link doubles as the file version and a
+new upload never hits stale text.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Upper bound on the total number of cached characters across all materials
+TEXT_CACHE_MAX_CHARS = int(os.getenv("TEXT_CACHE_MAX_CHARS", str(50_000_000)))
+
+
+class TextCache:
+    """Size-bounded LRU cache of extracted material text."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[int, tuple[str, str]]" = OrderedDict()  # material_id -> (file_link, text)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, material_id: int, file_link: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(material_id)
+            if entry is None or entry[0] != file_link:
+                return None
+            self._entries.move_to_end(material_id)
+            return entry[1]
+
+    def put(self, material_id: int, file_link: str, text: str):
+        # Documents larger than the whole cache would just evict everything else
+        if len(text) > self.max_chars:
+            return
+        with self._lock:
+            self._pop(material_id)
+            self._entries[material_id] = (file_link, text)
+            self._size += len(text)
+            while self._size > self.max_chars:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, material_id: int):
+        """Drop the cached text of a material (called when its file_link changes)."""
+        with self._lock:
+            self._pop(material_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _pop(self, material_id: int):
+        entry = self._entries.pop(material_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+text_cache = TextCache(TEXT_CACHE_MAX_CHARS)
@@ -0,0 +1,352 @@
+"""
+Text extraction for course material files (PDF, DOCX, TXT)
+Used by the chatbot on the read path and by the background extraction worker on upload
+
+Downloads are spooled to a temporary file in fixed-size chunks (kept in memory only
+while small) and documents are parsed lazily with a character budget, so memory use
+does not grow with the size of the file. Large PDFs are split into page ranges that
+are parsed on a process pool, keeping pypdf's CPU work off the request threads.
+
+The parser is picked by MIME type from the EXTRACTORS registry: the content type stored
+with the material at upload, else the file extension, else the magic bytes at the
+start of the (single) download.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+import codecs
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import requests
+from docx import Document
+from pypdf import PdfReader
+
+import http_client
+
+# Refuse to download files larger than this
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES", str(200 * 1024 * 1024)))
+# Spooled downloads/uploads stay in memory up to this size, then roll over to disk
+SPOOL_MEMORY_BYTES = int(os.getenv("SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+# Stop parsing once this many characters have been extracted from a document
+MAX_EXTRACTED_CHARS = int(os.getenv("MAX_EXTRACTED_CHARS", str(2_000_000)))
+# Processes used for page-parallel PDF extraction (1 disables it)
+PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+# PDFs with fewer pages are parsed serially; process start-up and re-reading the xref are not worth it
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_MIN_PAGES_PER_SHARD = 4
+# Bytes looked at to identify files of unknown type
+SNIFF_BYTES = 2048
+
+PDF_MIME = 'application/pdf'
+DOCX_MIME = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+TXT_MIME = 'text/plain'
+EXTENSION_MIME_TYPES = {
+    '.pdf': PDF_MIME,
+    '.docx': DOCX_MIME,
+    '.txt': TXT_MIME,
+    '.text': TXT_MIME,
+}
+# Content types some clients send for the formats above
+MIME_ALIASES = {
+    'application/x-pdf': PDF_MIME,
+    'application/msword': DOCX_MIME,
+}
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+class DownloadTooLarge(Exception):
+    pass
+
+
+class ExtractedText(NamedTuple):
+    text: str
+    page_count: Optional[int]  # Only known for paginated formats (PDF)
+
+
+def new_spool():
+    """Temporary file that lives in memory until SPOOL_MEMORY_BYTES, then on disk."""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+
+
+def download_to_spool(url: str):
+    """
+    Download a URL in chunks into a spooled temporary file, rewound and ready to read.
+    Raises DownloadTooLarge above MAX_DOWNLOAD_BYTES. The caller must close the file.
+    """
+    # Reading the body to the end returns the connection to the shared pool for the next download
+    with http_client.get(url, stream=True) as response:
+        response.raise_for_status()
+
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > MAX_DOWNLOAD_BYTES:
+            raise DownloadTooLarge(f"{url} is {declared} bytes (limit {MAX_DOWNLOAD_BYTES})")
+
+        spool = new_spool()
+        try:
+            total = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                total += len(chunk)
+                if total > MAX_DOWNLOAD_BYTES:
+                    raise DownloadTooLarge(f"{url} exceeds {MAX_DOWNLOAD_BYTES} bytes")
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+
+    print(f"Downloaded {total} bytes")
+    spool.seek(0)
+    return spool
+
+
+def _take(parts: Iterator[str], separator: str, max_chars: int) -> str:
+    """Join text parts until max_chars is reached, without consuming the rest of the iterator."""
+    collected = []
+    size = 0
+    for part in parts:
+        collected.append(part)
+        size += len(part) + len(separator)
+        if size >= max_chars:
+            print(f"Reached extraction budget of {max_chars} characters, stopping early")
+            break
+    return separator.join(collected)[:max_chars]
+
+
+def normalize_mime_type(content_type: Optional[str]) -> Optional[str]:
+    """'Text/Plain; charset=utf-8' -> 'text/plain'"""
+    if not content_type:
+        return None
+    return content_type.split(';')[0].strip().lower() or None
+
+
+def resolve_mime_type(name: Optional[str], content_type: Optional[str] = None) -> Optional[str]:
+    """
+    MIME type to extract a file with: the declared content type if an extractor is
+    registered for it, otherwise the one of the filename/URL extension.
+    Returns None when neither gives a supported type (see sniff_mime_type).
+    """
+    mime_type = normalize_mime_type(content_type)
+    mime_type = MIME_ALIASES.get(mime_type, mime_type)
+    if mime_type in EXTRACTORS:
+        return mime_type
+    extension = os.path.splitext((name or "").lower().split('?')[0])[1]
+    return EXTENSION_MIME_TYPES.get(extension)
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """Identify a file from its first bytes: PDF and ZIP (DOCX) magic numbers, else UTF-8 text."""
+    if head.startswith(b'%PDF-'):
+        return PDF_MIME
+    if head.startswith(b'PK\x03\x04'):
+        return DOCX_MIME  # The only ZIP-based format we parse
+    if head and b'\x00' not in head:
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            return TXT_MIME
+        except UnicodeDecodeError:
+            return None
+    return None
+
+
+def peek(file: BinaryIO, size: int = SNIFF_BYTES) -> bytes:
+    """Read the first bytes of a seekable file and rewind it."""
+    file.seek(0)
+    head = file.read(size)
+    file.seek(0)
+    return head
+
+
+def iter_docx_paragraphs(file: BinaryIO) -> Iterator[str]:
+    """Yield the non-empty paragraphs of a DOCX file object."""
+    doc = Document(file)
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():  # Only add non-empty paragraphs
+            yield paragraph.text
+
+
+def extract_docx(file: BinaryIO, max_chars: int = MAX_EXTRACTED_CHARS) -> ExtractedText:
+    """Extract paragraph text from a DOCX file object using python-docx."""
+    return ExtractedText(_take(iter_docx_paragraphs(file), '\n', max_chars), None)
+
+
+def extract_txt(file: BinaryIO, max_chars: int = MAX_EXTRACTED_CHARS) -> ExtractedText:
+    """Decode a plain text file object, reading at most what the character budget needs."""
+    # UTF-8 uses at most 4 bytes per character
+    content = file.read(max_chars * 4)
+    # Try to decode as UTF-8 (tolerating a character cut at the end of the read), fallback to latin-1
+    try:
+        text = codecs.getincrementaldecoder('utf-8')().decode(content, final=False)
+    except UnicodeDecodeError:
+        text = content.decode('latin-1')
+    return ExtractedText(text[:max_chars], None)
+
+
+def iter_pdf_pages(pdf_reader: PdfReader, start: int = 0) -> Iterator[str]:
+    """Yield the text of each non-empty PDF page from index `start`, parsing pages only as they are consumed."""
+    total_pages = len(pdf_reader.pages)
+    for page_num in range(start + 1, total_pages + 1):
+        try:
+            page_text = pdf_reader.pages[page_num - 1].extract_text()
+            if page_text.strip():  # Only add non-empty pages
+                print(f"Extracted text from page {page_num}/{total_pages}")
+                yield page_text
+        except Exception as e:
+            print(f"Warning: Could not extract text from page {page_num}: {e}")
+            continue
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: forking a multi-threaded server process can deadlock the children
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def _reset_pdf_pool(broken: ProcessPoolExecutor):
+    """Drop a pool whose worker died (e.g. OOM-killed) so the next PDF spawns a fresh one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is broken:
+            _pdf_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_pdf_page_range(path: str, start: int, end: int) -> list:
+    """Process pool task: text of pages [start, end) of the PDF at `path`."""
+    pdf_reader = PdfReader(path)
+    texts = []
+    for page_index in range(start, end):
+        try:
+            texts.append(pdf_reader.pages[page_index].extract_text())
+        except Exception as e:
+            print(f"Warning: Could not extract text from page {page_index + 1}: {e}")
+            texts.append("")
+    return texts
+
+
+def _iter_pdf_pages_parallel(file: BinaryIO, pdf_reader: PdfReader) -> Iterator[str]:
+    """
+    Yield non-empty page texts in page order, with page ranges parsed on the process pool.
+    Shards that have not started yet are cancelled if the consumer stops early.
+    If a worker process dies, the pool is reset and the remaining pages are parsed serially.
+    """
+    total_pages = len(pdf_reader.pages)
+    # Worker processes need a path, so the (possibly in-memory) spool is copied to a named file
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as pdf_path:
+        file.seek(0)
+        shutil.copyfileobj(file, pdf_path)
+        pdf_path.flush()
+
+        # About two shards per worker balances uneven pages without re-reading the xref too often
+        shard_size = max(PDF_MIN_PAGES_PER_SHARD, math.ceil(total_pages / (PDF_PROCESS_WORKERS * 2)))
+        pool = _get_pdf_pool()
+        futures = []
+        next_page = 0  # First page not yielded yet
+        try:
+            for start in range(0, total_pages, shard_size):
+                futures.append(pool.submit(_extract_pdf_page_range, pdf_path.name, start, min(start + shard_size, total_pages)))
+            print(f"Extracting {total_pages} PDF pages in {len(futures)} shards on {PDF_PROCESS_WORKERS} processes")
+            for future in futures:
+                for page_text in future.result():
+                    next_page += 1
+                    if page_text.strip():  # Only add non-empty pages
+                        yield page_text
+        except BrokenProcessPool:
+            print(f"PDF process pool broken (worker process died), parsing pages {next_page + 1}-{total_pages} serially")
+            _reset_pdf_pool(pool)
+        else:
+            return
+        finally:
+            for future in futures:
+                future.cancel()
+    yield from iter_pdf_pages(pdf_reader, next_page)
+
+
+def extract_pdf(file: BinaryIO, max_chars: int = MAX_EXTRACTED_CHARS, parallel: Optional[bool] = None) -> ExtractedText:
+    """
+    Extract text from a PDF file object using pypdf (the file is read lazily, not loaded whole).
+    By default PDFs with at least PDF_PARALLEL_MIN_PAGES pages are parsed on the process pool.
+    """
+    pdf_reader = PdfReader(file)
+    total_pages = len(pdf_reader.pages)
+    print(f"PDF has {total_pages} pages")
+
+    if parallel is None:
+        parallel = PDF_PROCESS_WORKERS > 1 and total_pages >= PDF_PARALLEL_MIN_PAGES
+    pages = _iter_pdf_pages_parallel(file, pdf_reader) if parallel else iter_pdf_pages(pdf_reader)
+    try:
+        return ExtractedText(_take(pages, '\n\n', max_chars), total_pages)
+    finally:
+        pages.close()
+
+
+# Extractors by MIME type; add an entry (or call register_extractor) to support a new format
+EXTRACTORS = {
+    PDF_MIME: extract_pdf,
+    DOCX_MIME: extract_docx,
+    TXT_MIME: extract_txt,
+}
+
+
+def register_extractor(mime_type: str, extractor, extensions: tuple = ()):
+    """Register `extractor(file) -> ExtractedText` for a MIME type and optional file extensions."""
+    EXTRACTORS[mime_type] = extractor
+    for extension in extensions:
+        EXTENSION_MIME_TYPES[extension] = mime_type
+
+
+def extract_file(file: BinaryIO, mime_type: str) -> ExtractedText:
+    """Extract text from an open file object of the given MIME type."""
+    extractor = EXTRACTORS.get(mime_type)
+    if extractor is None:
+        raise ValueError(f"Unsupported file type: {mime_type}")
+    return extractor(file)
+
+
+def extract_text_from_url(url: str, content_type: Optional[str] = None) -> Optional[str]:
+    """
+    Download a material file once and extract its text.
+    The parser is chosen from the stored content type or the URL extension; for legacy
+    links with neither, from the magic bytes at the start of the download.
+    """
+    if not url or not url.strip():
+        return None
+
+    mime_type = resolve_mime_type(url, content_type)
+    try:
+        print(f"Attempting to download {mime_type or 'file of unknown type'} from: {url}")
+        with download_to_spool(url) as file:
+            if mime_type is None:
+                mime_type = sniff_mime_type(peek(file))
+                if mime_type is None:
+                    print(f"Unsupported file type for URL: {url}")
+                    return None
+                print(f"Detected {mime_type} from file contents")
+            extracted, page_count = extract_file(file, mime_type)
+        print(f"Extracted {len(extracted)} characters" + (f" ({page_count} pages)" if page_count else ""))
+
+        if not extracted.strip():
+            print("⚠️ File appears to be empty or contains only images/scanned content")
+            return None
+        return extracted
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error downloading file from {url}: {e}")
+        print(f"Response status: {getattr(e.response, 'status_code', 'N/A')}")
+        return None
+    except Exception as e:
+        print(f"Error extracting text from {url}: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
@@ -0,0 +1,74 @@
+"""
+Short-lived cache of authenticated users, keyed by token subject (email).
+Lets oauth2.get_current_user skip the users lookup on most authenticated requests.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Detached snapshot of the authenticated user (safe to share between requests and sessions)."""
+    id: int
+    name: Optional[str]
+    email: str
+    karma: Optional[int] = None  # Not known when built from token claims alone
+
+    @classmethod
+    def from_model(cls, user) -> "CurrentUser":
+        return cls(id=user.id, name=user.name, email=user.email, karma=getattr(user, 'karma', None))
+
+
+class UserCache:
+    """LRU of CurrentUser entries that expire AUTH_CACHE_TTL_SECONDS after being loaded."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, CurrentUser]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return user
+
+    def put(self, subject: str, user: CurrentUser):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached entry of a user (called when the user's row changes)."""
+        with self._lock:
+            for subject in [s for s, (_, user) in self._entries.items() if user.id == user_id]:
+                del self._entries[subject]
+
+    def invalidate_subject(self, subject: str):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES)